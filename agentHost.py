@@ -0,0 +1,237 @@
+# agentHost.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for 
+# educational purposes provided that (1) you do not distribute or publish 
+# solutions, (2) you retain this notice, and (3) you provide clear 
+# attribution to UC Berkeley, including a link to 
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero 
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and 
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+
+"""
+Runs agents in long-lived worker processes, so that an agent which hangs or
+crashes cannot take the game engine (or a batch of games) down with it.  A
+worker keeps its agent from one game to the next, so what the agent learns
+carries over, and runGames stops it once all its games are played.
+
+A RemoteAgent stands in for the agent in the engine's process.  The first
+state of each game is sent in full; afterwards only what changed since the
+last state sent is shipped: agent configurations, score and flags, plus the
+food grid in Grid.packBits form whenever it differs.  Given the game rules,
+the engine waits for each reply at most as long as they allow the agent for
+that step (pacman.py passes them only with -c, as only then does the engine
+enforce them) and replaces a worker that overruns or dies; a replacement is
+brought up to the game in progress by registering the game's first state
+with it again.
+
+Turns are sequential, so one agent's decision cannot start before the previous
+agent has moved; what does overlap is startup.  Game.run calls
+beginRegisterInitialState on every agent before waiting on any of them, so all
+agents do their startup computation at the same time.
+"""
+import multiprocessing
+import random
+import sys
+import traceback
+
+from game import AgentState, Configuration, Grid
+from util import TimeoutFunctionException
+
+class RemoteAgent:
+    """
+    A proxy for an agent living in a worker process.  It offers the same
+    optional methods (observationFunction, registerInitialState, final) as
+    the agent it wraps, so Game.run treats it like the agent itself.
+    """
+    def __init__( self, agent, rules=None ):
+        self.agent = agent
+        self.index = getattr(agent, 'index', 0)
+        # With no rules, wait as long as the agent takes
+        self.moveTimeout = None
+        self.startupTimeout = None
+        if rules != None:
+            self.moveTimeout = rules.getMoveTimeout(self.index)
+            self.startupTimeout = rules.getMaxStartupTime(self.index)
+        self.connection = None
+        self.worker = None
+        self.pending = None
+        self.lastSent = None
+        self.initialState = None # What the agent was registered with this game
+        if 'registerInitialState' in dir(agent):
+            self.registerInitialState = self._registerInitialState
+            self.beginRegisterInitialState = self._beginRegisterInitialState
+        if 'observationFunction' in dir(agent):
+            self.observationFunction = self._observationFunction
+        if 'final' in dir(agent):
+            self.final = self._final
+
+    def getAction( self, state ):
+        return self._call('getAction', state)
+
+    def _beginRegisterInitialState( self, state ):
+        "Starts the agent's startup computation without waiting for it to finish"
+        self.lastSent = None
+        self.initialState = state
+        self._send('registerInitialState', state)
+        self.pending = 'registerInitialState'
+
+    def _registerInitialState( self, state ):
+        if self.pending == 'registerInitialState':
+            self.pending = None
+            return self._receive(self.startupTimeout)
+        self.lastSent = None
+        self.initialState = state
+        self._send('registerInitialState', state)
+        return self._receive(self.startupTimeout)
+
+    def _observationFunction( self, state ):
+        self._call('observationFunction', state)
+        # The worker keeps the agent's own observation for the next getAction
+        return state
+
+    def _final( self, state ):
+        return self._call('final', state)
+
+    def close( self ):
+        "Stops the worker process"
+        if self.worker == None: return
+        try:
+            self.connection.send(('stop', None))
+        except IOError:
+            pass
+        self.worker.join(1)
+        if self.worker.is_alive(): self.worker.terminate()
+        self.worker = None
+        self.connection = None
+        self.initialState = None
+
+    def _start( self ):
+        self.connection, workerConnection = multiprocessing.Pipe()
+        # Each worker draws its own random numbers, repeatably for a fixed seed
+        seed = (random.getrandbits(64), self.index)
+        self.worker = multiprocessing.Process(target=serveAgent, args=(self.agent, workerConnection, seed))
+        self.worker.daemon = True
+        self.worker.start()
+        workerConnection.close()
+        self.lastSent = None
+
+    def _kill( self ):
+        if self.worker == None: return
+        if self.worker.is_alive(): self.worker.terminate()
+        self.worker.join()
+        self.worker = None
+        self.connection = None
+        self.pending = None
+
+    def _call( self, command, state ):
+        self._send(command, state)
+        return self._receive(self.moveTimeout)
+
+    def _send( self, command, state ):
+        if self.worker == None or not self.worker.is_alive():
+            self._kill()
+            self._start()
+            if command != 'registerInitialState' and self.initialState != None:
+                # The new worker holds a fresh copy of the agent
+                self._send('registerInitialState', self.initialState)
+                self._receive(self.startupTimeout)
+        if self.lastSent == None:
+            message = ('full', state)
+        else:
+            message = ('delta', encodeDelta(self.lastSent, state))
+        self.connection.send((command, message))
+        self.lastSent = state
+
+    def _receive( self, timeout ):
+        try:
+            if not self.connection.poll(timeout):
+                raise TimeoutFunctionException()
+            status, result = self.connection.recv()
+        except (EOFError, IOError):
+            self._kill()
+            raise Exception('Agent %d: worker process died' % self.index)
+        except:
+            # Timed out, possibly interrupted by the engine's own timer.  The
+            # worker is still busy with the old request, so replace it.
+            self._kill()
+            raise
+        if status == 'error':
+            raise Exception('Agent %d raised an exception in its worker:\n%s' % (self.index, result))
+        return result
+
+def encodeDelta( previous, state ):
+    """
+    Describes state by what changed since previous (both from the same game).
+    With no previous state the food grid is always included.
+    """
+    new = state.data
+    agents = []
+    for agentState in new.agentStates:
+        conf = agentState.configuration
+        if conf == None: agents.append((agentState.isPacman, None, None, agentState.scaredTimer, agentState.numCarrying))
+        else: agents.append((agentState.isPacman, conf.pos, conf.direction, agentState.scaredTimer, agentState.numCarrying))
+    food = None
+    if previous == None or new.food.data != previous.data.food.data: food = new.food.packBits()
+    flags = (new.score, new.scoreChange, new._eaten[:], new._win, new._lose,
+             new._agentMoved, new._foodEaten, new._foodAdded, new._capsuleEaten)
+    return food, new.capsules, agents, flags
+
+def applyDelta( previous, delta ):
+    "Builds the state described by delta from the previous state sent"
+    food, capsules, agents, flags = delta
+    state = previous.deepCopy(copyLayout=False)
+    data = state.data
+    if food != None: data.food = Grid(food[0], food[1], bitRepresentation=food[2:])
+    data.capsules = capsules
+    while len(data.agentStates) < len(agents):
+        data.agentStates.append(AgentState(None, agents[len(data.agentStates)][0]))
+    del data.agentStates[len(agents):]
+    for agentState, (isPacman, pos, direction, scaredTimer, numCarrying) in zip(data.agentStates, agents):
+        agentState.isPacman = isPacman
+        if pos == None: agentState.configuration = None
+        else: agentState.configuration = Configuration(pos, direction)
+        agentState.scaredTimer = scaredTimer
+        agentState.numCarrying = numCarrying
+    (data.score, data.scoreChange, data._eaten, data._win, data._lose,
+     data._agentMoved, data._foodEaten, data._foodAdded, data._capsuleEaten) = flags
+    return state
+
+def serveAgent( agent, connection, seed ):
+    "The worker process loop: rebuild each state sent and run the agent on it"
+    random.seed(seed)
+    # Workers must never draw on the engine's display
+    if 'search' in sys.modules: sys.modules['search'].setSearchObserver(None)
+    state = None
+    observation = None
+    while True:
+        try:
+            command, message = connection.recv()
+        except (EOFError, IOError):
+            return
+        if command == 'stop': return
+        kind, payload = message
+        if kind == 'full': state = payload
+        else: state = applyDelta(state, payload)
+        try:
+            if command == 'observationFunction':
+                observation = agent.observationFunction(state)
+                result = None
+            elif command == 'getAction':
+                if observation == None: observation = state
+                result = agent.getAction(observation)
+                observation = None
+            else:
+                result = getattr(agent, command)(state)
+            connection.send(('ok', result))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+def isolateAgents( agents, rules=None ):
+    "Wraps each agent in a RemoteAgent"
+    return [RemoteAgent(agent, rules) for agent in agents]
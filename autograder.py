@@ -76,7 +76,42 @@ def readCommand(argv):
                     dest = 'graphics',
                     action = 'store_true',
                     help = 'Display graphics for pacman games.')
+    parser.add_option('--parallel',
+                    dest = 'parallel',
+                    type = 'int',
+                    default = 1,
+                    help = 'Run test cases in this many worker processes (implies --no-graphics); each test is started from the same random seed.')
+    parser.add_option('--test-timeout',
+                    dest = 'testTimeout',
+                    type = 'int',
+                    default = 300,
+                    help = 'Seconds a single test case may run for when running in parallel.')
+    parser.add_option('--parse-cache',
+                    dest = 'parseCache',
+                    default = None,
+                    help = 'Keep parsed test and solution files in this file between runs.')
+    parser.add_option('--incremental',
+                    dest = 'incremental',
+                    default = None,
+                    help = 'Store test results in this file and rerun only tests whose code or files changed since.')
+    parser.add_option('--batch',
+                    dest = 'batchRoot',
+                    default = None,
+                    help = 'Grade every submission in the subdirectories of this directory, writing one JSON line per submission.')
+    parser.add_option('--batch-output',
+                    dest = 'batchOutput',
+                    default = None,
+                    help = 'File to stream --batch results to (default: standard output).')
+    parser.add_option('--submission-timeout',
+                    dest = 'submissionTimeout',
+                    type = 'int',
+                    default = 1800,
+                    help = 'Seconds allowed for grading one submission in --batch mode.')
     (options, args) = parser.parse_args(argv)
+    if options.incremental != None and options.parallel > 1:
+        parser.error('--incremental cannot be combined with --parallel')
+    if options.parallel > 1:
+        options.noGraphics = True
     return options
 
 
@@ -216,6 +251,390 @@ def runTest(testName, moduleDict, printTestCase=False, display=None):
     testCase.execute(grades, moduleDict, solutionDict)
 
 
+# Parallel test execution.  Each test case thunk runs in a worker process
+# against a grading.GradesRecorder; the question code then runs as usual in
+# this process, with each thunk replaced by one that replays the recorded
+# grades operations and output.  Questions therefore see their tests' results
+# in the same order as in a sequential run, whatever order the workers finish.
+#
+# Random numbers are the one thing a worker cannot replay.  A sequential run
+# seeds once, when the autograder is imported, and each test draws from where
+# the previous one left off.  A worker only runs some of the tests, so instead
+# it reseeds before every test, as --incremental does.  Each test then gets
+# the same numbers whichever worker runs it, but not the numbers it would get
+# in a sequential run.  Grades match only while no test depends on random
+# numbers drawn by earlier tests, which holds for the current tests.
+
+# Filled in before the worker pool forks, so workers find thunks by index
+PARALLEL_THUNKS = []
+
+# Extra seconds to wait on a worker beyond the test timeout it enforces itself
+WORKER_GRACE_TIME = 30
+
+def runThunkRecorded(thunk, timeout=None, profiler=None):
+    """
+    Runs a test thunk against a grading.GradesRecorder, returning the
+    operations recorded and how the thunk finished.  Without a timeout of its
+    own, a TimeoutFunctionException (the question's time limit) propagates.
+    profiler, if given, is installed with sys.setprofile while the test runs.
+    """
+    import cStringIO
+    import traceback
+    import util
+    output = cStringIO.StringIO()
+    recorder = grading.GradesRecorder(output)
+    if timeout != None:
+        thunk = util.TimeoutFunction(thunk, timeout)
+    oldStdout = sys.stdout
+    sys.stdout = output
+    try:
+        try:
+            sys.setprofile(profiler)
+            try:
+                outcome = ('return', thunk(recorder))
+            finally:
+                sys.setprofile(None)
+        except util.TimeoutFunctionException:
+            if timeout == None:
+                raise
+            outcome = ('raise', str(util.TimeoutFunctionException), 'Test timed out after %d seconds' % timeout, traceback.format_exc())
+        except Exception, inst:
+            outcome = ('raise', str(type(inst)), str(inst), traceback.format_exc())
+        except:
+            outcome = ('exit', None, None, None)
+    finally:
+        sys.stdout = oldStdout
+    recorder.flushOutput()
+    return recorder.operations, outcome
+
+def replayOutcome(grades, operations, outcome):
+    "Replays what runThunkRecorded returned as if the test had just run on grades"
+    grading.replay(grades, operations)
+    kind, result = outcome[:2]
+    if kind == 'return':
+        return result
+    if kind == 'exit':
+        raise SystemExit()
+    raise grading.RemoteTestException(*outcome[1:])
+
+def runThunkInWorker(index, timeout):
+    # every test sees the same random numbers, whichever worker runs it (see above)
+    random.seed(0)
+    return runThunkRecorded(PARALLEL_THUNKS[index], timeout)
+
+def makeReplayThunk(asyncResult, timeout):
+    import multiprocessing
+    def replay(grades):
+        try:
+            operations, outcome = asyncResult.get(timeout + WORKER_GRACE_TIME)
+        except multiprocessing.TimeoutError:
+            raise grading.RemoteTestException('timeout', 'Test worker did not respond', '')
+        return replayOutcome(grades, operations, outcome)
+    return replay
+
+def startParallelTests(questions, workers, timeout):
+    """
+    Starts every test case of questions on a pool of workers and swaps in
+    thunks that replay their results.  Returns the pool.
+    """
+    import multiprocessing
+    for question in questions:
+        for testCase, thunk in question.testCases:
+            PARALLEL_THUNKS.append(thunk)
+    pool = multiprocessing.Pool(workers)
+    index = 0
+    for question in questions:
+        testCases = []
+        for testCase, thunk in question.testCases:
+            asyncResult = pool.apply_async(runThunkInWorker, (index, timeout))
+            testCases.append((testCase, makeReplayThunk(asyncResult, timeout)))
+            index += 1
+        question.testCases = testCases
+    pool.close()
+    return pool
+
+
+# Incremental grading.  Each test runs with a profiler noting which functions
+# of the project's own modules (student code, test classes and framework) it
+# called.  Those functions are fingerprinted by their bytecode, constants and
+# defaults, which line numbers do not affect, together with the data held by
+# their classes and the public data of their modules (the running script's
+# data being only its options, it is left out).  A later run replays a test's stored result
+# unless one of those fingerprints, the test or solution file, or a layout
+# file the test loaded changed.
+# Questions themselves always run, so prerequisites from the depends entries
+# in CONFIG are applied to replayed results just as to fresh ones.
+
+INCREMENTAL_VERSION = 2
+
+def stableRepr(value):
+    "repr without the memory addresses that differ between runs"
+    return re.sub(' at 0x[0-9a-fA-F]+', '', repr(value))
+
+def codeFingerprint(code):
+    import hashlib
+    import types
+    parts = [code.co_code, repr(code.co_names), repr(code.co_varnames), repr(code.co_freevars),
+             repr(code.co_cellvars), str(code.co_argcount), str(code.co_flags)]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            parts.append(codeFingerprint(const))
+        else:
+            parts.append(stableRepr(const))
+    return hashlib.sha1('\0'.join(parts)).hexdigest()
+
+class CodeIndex:
+    """
+    Names and fingerprints for the functions, classes and module data of
+    the given modules (the student code and test classes), and of every
+    other loaded module that lives in root or beside the autograder.
+    """
+    def __init__(self, root, modules):
+        self.names = {} # code object -> keys of the function, its class and its module
+        self.fingerprints = {}
+        # loadModuleFile leaves the student modules a bare file name, so
+        # they are taken as given rather than found by where their file is
+        indexed = dict([(module.__name__, module) for module in modules])
+        roots = [os.path.abspath(root), os.path.dirname(os.path.abspath(__file__))]
+        for moduleName, module in sys.modules.items():
+            fileName = getattr(module, '__file__', None)
+            if moduleName not in indexed and fileName != None and os.path.dirname(os.path.abspath(fileName)) in roots:
+                indexed[moduleName] = module
+        for moduleName, module in indexed.items():
+            self.addModule(moduleName, module)
+
+    def addModule(self, moduleName, module):
+        import hashlib
+        import types
+        moduleKey = moduleName
+        data = []
+        for name, value in vars(module).items():
+            if isinstance(value, types.FunctionType):
+                if value.__module__ == module.__name__:
+                    self.addFunction('%s.%s' % (moduleKey, name), value, [moduleKey])
+            elif isinstance(value, (type, types.ClassType)):
+                if value.__module__ == module.__name__:
+                    self.addClass('%s.%s' % (moduleKey, name), value, moduleKey)
+            elif not isinstance(value, types.ModuleType) and not name.startswith('_') and moduleName != '__main__':
+                # Not the script's data, its command line options, nor private
+                # state such as util's muting: they say how to grade, not what
+                data.append((name, stableRepr(value)))
+        self.fingerprints[moduleKey] = hashlib.sha1(repr(sorted(data))).hexdigest()
+
+    def addClass(self, classKey, cls, moduleKey):
+        import hashlib
+        import types
+        data = [('__bases__', [base.__name__ for base in cls.__bases__])]
+        for name, value in vars(cls).items():
+            value = getattr(value, '__func__', value) # staticmethod and classmethod
+            if isinstance(value, types.FunctionType):
+                self.addFunction('%s.%s' % (classKey, name), value, [classKey, moduleKey])
+            elif name not in ('__dict__', '__weakref__', '__doc__', '__module__'):
+                data.append((name, stableRepr(value)))
+        self.fingerprints[classKey] = hashlib.sha1(repr(sorted(data))).hexdigest()
+
+    def addFunction(self, key, function, containerKeys):
+        self.names[function.func_code] = [key] + containerKeys
+        defaults = stableRepr(function.func_defaults)
+        self.fingerprints[key] = codeFingerprint(function.func_code) + defaults
+
+    def dependencies(self, codes):
+        "Returns the fingerprints of everything the given code objects depend on"
+        depends = {}
+        for code in codes:
+            for key in self.names.get(code, []):
+                depends[key] = self.fingerprints[key]
+        return depends
+
+    def unchanged(self, depends):
+        for key, fingerprint in depends.items():
+            if self.fingerprints.get(key) != fingerprint:
+                return False
+        return True
+
+class IncrementalResults:
+    """
+    Test results from earlier runs, by test file, along with the fingerprints
+    of everything each test depended on.  Stored in a pickle at path.
+    """
+    def __init__(self, path, codeRoot, moduleDict):
+        import cPickle
+        self.path = path
+        self.codeRoot = codeRoot or '.'
+        self.modules = moduleDict.values()
+        self.index = None
+        self.results = {}
+        self.reused = 0
+        self.ran = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as handle:
+                stored = cPickle.load(handle)
+            if stored.get('version') == INCREMENTAL_VERSION:
+                self.results = stored['results']
+
+    def wrapTests(self, questions):
+        "Replaces the test thunks of questions with ones that reuse stored results"
+        for question in questions:
+            question.testCases = [(testCase, self.makeThunk(testCase, thunk)) for testCase, thunk in question.testCases]
+
+    def makeThunk(self, testCase, thunk):
+        def incremental(grades):
+            if self.index == None:
+                # every module the tests use is loaded by now
+                self.index = CodeIndex(self.codeRoot, self.modules)
+            path = testCase.getPath()
+            stamps = self.fileStamps(path)
+            stored = self.results.get(path)
+            # a test that called none of the indexed code cannot be told apart from one that was not tracked
+            if (stored != None and stored['stamps'] == stamps and stored['depends']
+                and self.index.unchanged(stored['depends']) and self.layoutsUnchanged(stored['layouts'])):
+                self.reused += 1
+                return replayOutcome(grades, stored['operations'], stored['outcome'])
+            import layout
+            loadLayout = layout.tryToLoad.func_code
+            called = set()
+            layouts = set()
+            def profiler(frame, event, arg):
+                if event == 'call':
+                    called.add(frame.f_code)
+                    if frame.f_code is loadLayout:
+                        # relative to the directory it is loaded from, as getLayout moves up to look
+                        layouts.add(os.path.abspath(frame.f_locals['fullname']))
+            # the same random numbers whichever tests are skipped
+            random.seed(0)
+            operations, outcome = runThunkRecorded(thunk, profiler=profiler)
+            self.results[path] = {'stamps': stamps, 'depends': self.index.dependencies(called),
+                                  'layouts': dict([(p, self.pathStamp(p)) for p in layouts]),
+                                  'operations': operations, 'outcome': outcome}
+            self.ran += 1
+            return replayOutcome(grades, operations, outcome)
+        return incremental
+
+    def fileStamps(self, testPath):
+        return [self.pathStamp(path) for path in (testPath, re.sub('\.test\Z', '.solution', testPath))]
+
+    def pathStamp(self, path):
+        "The testParser stamp of the file at path, or None if there is none"
+        import testParser
+        if os.path.exists(path):
+            return testParser.fileStamp(path)
+        return None
+
+    def layoutsUnchanged(self, layouts):
+        "Whether the layout files a test looked for, found or not, are as they were"
+        for path, stamp in layouts.items():
+            if self.pathStamp(path) != stamp:
+                return False
+        return True
+
+    def save(self):
+        import cPickle
+        tempPath = self.path + '.tmp'
+        with open(tempPath, 'wb') as handle:
+            cPickle.dump({'version': INCREMENTAL_VERSION, 'results': self.results}, handle, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tempPath, self.path)
+
+
+# Batch grading.  The test tree is parsed once up front; each submission is
+# then graded in a fresh process forked from this one, so that it loads its
+# own copies of the student modules, and a record of its points is written
+# as soon as it finishes.
+
+def findSubmissions(batchRoot, codePaths):
+    "Returns the subdirectories of batchRoot that hold all the student code files"
+    submissions = []
+    for name in sorted(os.listdir(batchRoot)):
+        path = os.path.join(batchRoot, name)
+        if not os.path.isdir(path) or name[0] == '.': continue
+        if all([os.path.exists(os.path.join(path, cp)) for cp in codePaths]):
+            submissions.append(path)
+    return submissions
+
+def gradeSubmission(submission, options, results):
+    import time
+    import traceback
+    import textDisplay
+    # the grading output is summarised in the record instead
+    sys.stdout = open(os.devnull, 'w')
+    # loading modules by name would otherwise write their bytecode to the current directory
+    sys.dont_write_bytecode = True
+    sys.path.insert(0, submission)
+    codePaths = options.studentCode.split(',')
+    for cp in codePaths:
+        sys.modules.pop(re.match('.*?([^/]*)\.py', cp).group(1), None)
+    record = {'submission': submission}
+    start = time.time()
+    try:
+        moduleDict = {}
+        for cp in codePaths:
+            moduleName = re.match('.*?([^/]*)\.py', cp).group(1)
+            moduleDict[moduleName] = loadModuleFile(moduleName, os.path.join(submission, cp))
+        moduleName = re.match('.*?([^/]*)\.py', options.testCaseCode).group(1)
+        moduleDict['projectTestClasses'] = loadModuleFile(moduleName, os.path.join(options.codeRoot, options.testCaseCode))
+        points = evaluate(False, options.testRoot, moduleDict, muteOutput=True, display=textDisplay.NullGraphics())
+        record['status'] = 'ok'
+        record['points'] = dict(points)
+        record['total'] = points.totalCount()
+    except:
+        record['status'] = 'error'
+        record['error'] = traceback.format_exc()
+    record['seconds'] = time.time() - start
+    results.put(record)
+
+def gradeBatch(submissions, options, output):
+    """
+    Grades submissions, options.parallel at a time, writing a JSON line per
+    submission to output as each one finishes.
+    """
+    import json
+    import multiprocessing
+    import Queue
+    import time
+    import testParser
+    testParser.preload(options.testRoot)
+    # import the framework before forking so that workers share it
+    import game, layout, pacman, textDisplay
+    # and the layouts the tests give, which every worker would otherwise parse
+    for stamp, parsed in testParser.PARSED.values():
+        if 'layout' in parsed: layout.getLayoutFromText(parsed['layout'])
+
+    def write(record):
+        output.write(json.dumps(record, sort_keys=True) + '\n')
+        output.flush()
+
+    results = multiprocessing.Queue()
+    waiting = list(submissions)
+    running = {}
+    while waiting or running:
+        while waiting and len(running) < max(1, options.parallel):
+            submission = waiting.pop(0)
+            worker = multiprocessing.Process(target=gradeSubmission, args=(submission, options, results))
+            worker.start()
+            running[submission] = (worker, time.time() + options.submissionTimeout)
+        try:
+            while True:
+                record = results.get(timeout=0.1)
+                # a worker stopped at its deadline may have put its record just before
+                finished = running.pop(record['submission'], None)
+                if finished == None: continue
+                finished[0].join()
+                write(record)
+        except Queue.Empty:
+            pass
+        for submission, (worker, deadline) in running.items():
+            if worker.is_alive() and time.time() < deadline: continue
+            # a worker may have put its record and exited since the queue was read
+            if not worker.is_alive() and not results.empty(): continue
+            if worker.is_alive():
+                worker.terminate()
+                status = 'timeout'
+            else:
+                status = 'error'
+            worker.join()
+            del running[submission]
+            write({'submission': submission, 'status': status})
+
+
 # returns all the tests you need to run in order to run question
 def getDepends(testParser, testRoot, question):
     allDeps = [question]
@@ -242,7 +661,7 @@ def getTestSubdirs(testParser, testRoot, questionToGrade):
 
 # evaluate student code
 def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MAP, edxOutput=False, muteOutput=False,
-            printTestCase=False, questionToGrade=None, display=None):
+            printTestCase=False, questionToGrade=None, display=None, parallel=1, testTimeout=300, incremental=None, codeRoot=''):
     # imports of testbench code.  note that the testClasses import must follow
     # the import of student code due to dependencies
     import testParser
@@ -251,6 +670,7 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
         setattr(sys.modules[__name__], module, moduleDict[module])
 
     questions = []
+    questionObjects = []
     questionDicts = {}
     test_subdirs = getTestSubdirs(testParser, testRoot, questionToGrade)
     for q in test_subdirs:
@@ -263,6 +683,7 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
         questionClass = getattr(testClasses, questionDict['class'])
         question = questionClass(questionDict, display)
         questionDicts[q] = questionDict
+        questionObjects.append(question)
 
         # load test cases into question
         tests = filter(lambda t: re.match('[^#~.].*\.test\Z', t), os.listdir(subdir_path))
@@ -277,19 +698,18 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             testDict['test_out_file'] = test_out_file
             testClass = getattr(projectTestClasses, testDict['class'])
             testCase = testClass(question, testDict)
-            def makefun(testCase, solution_file):
+            def makefun(testCase, testDict, solution_file):
                 if generateSolutions:
                     # write solution file to disk
                     return lambda grades: testCase.writeSolution(moduleDict, solution_file)
                 else:
                     # read in solution dictionary and pass as an argument
-                    testDict = testParser.TestParser(test_file).parse()
                     solutionDict = testParser.TestParser(solution_file).parse()
                     if printTestCase:
                         return lambda grades: printTest(testDict, solutionDict) or testCase.execute(grades, moduleDict, solutionDict)
                     else:
                         return lambda grades: testCase.execute(grades, moduleDict, solutionDict)
-            question.addTestCase(testCase, makefun(testCase, solution_file))
+            question.addTestCase(testCase, makefun(testCase, testDict, solution_file))
 
         # Note extra function is necessary for scoping reasons
         def makefun(question):
@@ -303,7 +723,21 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             for prereq in questionDicts[q].get('depends', '').split():
                 grades.addPrereq(q, prereq)
 
-    grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+    pool = None
+    results = None
+    if incremental != None and not generateSolutions:
+        results = IncrementalResults(incremental, codeRoot, moduleDict)
+        results.wrapTests(questionObjects)
+    elif parallel > 1:
+        pool = startParallelTests(questionObjects, parallel, testTimeout)
+    try:
+        grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+    finally:
+        if pool != None:
+            pool.terminate()
+    if results != None:
+        results.save()
+        print 'Reused %d stored test results and ran %d tests (%s).' % (results.reused, results.ran, incremental)
     return grades.points
 
 
@@ -330,6 +764,20 @@ if __name__ == '__main__':
     if options.generateSolutions:
         confirmGenerate()
     codePaths = options.studentCode.split(',')
+
+    if options.parseCache != None:
+        import testParser
+        testParser.loadCache(options.parseCache)
+
+    if options.batchRoot != None:
+        output = sys.stdout
+        if options.batchOutput != None:
+            output = open(options.batchOutput, 'w')
+        gradeBatch(findSubmissions(options.batchRoot, codePaths), options, output)
+        if options.parseCache != None:
+            testParser.saveCache(options.parseCache)
+        sys.exit(0)
+
     # moduleCodeDict = {}
     # for cp in codePaths:
     #     moduleName = re.match('.*?([^/]*)\.py', cp).group(1)
@@ -344,10 +792,14 @@ if __name__ == '__main__':
     moduleName = re.match('.*?([^/]*)\.py', options.testCaseCode).group(1)
     moduleDict['projectTestClasses'] = loadModuleFile(moduleName, os.path.join(options.codeRoot, options.testCaseCode))
 
-
     if options.runTest != None:
         runTest(options.runTest, moduleDict, printTestCase=options.printTestCase, display=getDisplay(True, options))
     else:
         evaluate(options.generateSolutions, options.testRoot, moduleDict,
             edxOutput=options.edxOutput, muteOutput=options.muteOutput, printTestCase=options.printTestCase,
-            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None, options))
+            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None, options),
+            parallel=options.parallel, testTimeout=options.testTimeout,
+            incremental=options.incremental, codeRoot=options.codeRoot)
+
+    if options.parseCache != None:
+        testParser.saveCache(options.parseCache)
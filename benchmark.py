@@ -0,0 +1,315 @@
+# benchmark.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Benchmarks the search functions in search.py on the search problems in
+searchAgents.py, sweeping every layout in the layouts directory.  Each run
+happens headless in its own process so that a slow run can be cut off and
+its peak memory measured on its own.
+
+To record a baseline and later check for regressions against it:
+
+> python benchmark.py --output baseline.json
+> python benchmark.py --compare baseline.json --threshold 0.25
+
+With --eightpuzzle the search functions run on the puzzles in
+eightpuzzle.EIGHT_PUZZLE_DATA instead, informed searches once per eight puzzle
+heuristic, and each run is also compared against breadth first search:
+
+> python benchmark.py --eightpuzzle
+
+Baselines ending in .csv are written and read as CSV, anything else as JSON.
+"""
+import csv
+import eightpuzzle
+import json
+import multiprocessing
+import os
+import Queue
+import resource
+import sys
+import time
+
+import layout
+import pacman
+import search
+import searchAgents
+
+ALGORITHMS = ['dfs', 'bfs', 'ucs', 'astar']
+PROBLEMS = ['PositionSearchProblem', 'CornersProblem', 'FoodSearchProblem', 'AnyFoodSearchProblem']
+
+# The heuristic astar uses for each problem type
+HEURISTICS = {'PositionSearchProblem': 'manhattanHeuristic',
+              'CornersProblem': 'cornersHeuristic',
+              'FoodSearchProblem': 'foodHeuristic',
+              'AnyFoodSearchProblem': 'nullHeuristic'}
+
+EIGHT_PUZZLE_ALGORITHMS = ['bfs', 'astar', 'idastar']
+EIGHT_PUZZLE_PROBLEMS = ['EightPuzzleSearchProblem', 'PackedEightPuzzleSearchProblem']
+EIGHT_PUZZLE_HEURISTICS = ['manhattanHeuristic', 'linearConflictHeuristic']
+
+FIELDS = ['layout', 'problem', 'algorithm', 'heuristic', 'status', 'wallTime', 'expanded', 'pathCost', 'peakRssKb']
+
+# Wall time differences below this many seconds are treated as noise in compare mode
+MIN_TIME_DIFFERENCE = 0.01
+
+def getLayoutNames():
+    return sorted([f[:-4] for f in os.listdir('layouts') if f.endswith('.lay')])
+
+def isApplicable(problemName, lay):
+    "Returns whether a problem type makes sense on a layout"
+    walls = lay.walls
+    if problemName == 'PositionSearchProblem':
+        return not walls[1][1]
+    if problemName == 'CornersProblem':
+        top, right = lay.height - 2, lay.width - 2
+        return not [c for c in ((1,1), (1,top), (right, 1), (right, top)) if walls[c[0]][c[1]]]
+    return lay.food.count() > 0
+
+def makeProblem(problemName, gameState):
+    if problemName == 'PositionSearchProblem':
+        return searchAgents.PositionSearchProblem(gameState, warn=False, visualize=False)
+    return getattr(searchAgents, problemName)(gameState)
+
+def isInformed(algorithm):
+    return 'heuristic' in getattr(search, algorithm).func_code.co_varnames
+
+def runOne(layoutName, problemName, algorithm, results):
+    "Runs a single search in the current process and puts its record on results"
+    sys.stdout = open(os.devnull, 'w')
+    lay = layout.getLayout(layoutName)
+    gameState = pacman.GameState()
+    gameState.initialize(lay, 0)
+    problem = makeProblem(problemName, gameState)
+    record = {'layout': layoutName, 'problem': problemName, 'algorithm': algorithm}
+    heuristic = None
+    if isInformed(algorithm):
+        heuristicName = HEURISTICS[problemName]
+        if heuristicName in dir(searchAgents): heuristic = getattr(searchAgents, heuristicName)
+        else: heuristic = getattr(search, heuristicName)
+    timeSearch(record, problem, algorithm, heuristic)
+    results.put(record)
+
+def runEightPuzzle(puzzleNumber, problemName, algorithm, heuristicName, results):
+    "Runs a single search on one of the EIGHT_PUZZLE_DATA puzzles and puts its record on results"
+    sys.stdout = open(os.devnull, 'w')
+    problem = getattr(eightpuzzle, problemName)(eightpuzzle.loadEightPuzzle(puzzleNumber))
+    record = {'layout': 'eightpuzzle%d' % puzzleNumber, 'problem': problemName, 'algorithm': algorithm}
+    heuristic = None
+    if heuristicName != None:
+        record['heuristic'] = heuristicName
+        heuristic = getattr(eightpuzzle, heuristicName)
+    timeSearch(record, problem, algorithm, heuristic)
+    results.put(record)
+
+def timeSearch(record, problem, algorithm, heuristic):
+    "Runs the search function named algorithm on problem and fills in record with how it went"
+    func = getattr(search, algorithm)
+    start = time.time()
+    if heuristic != None:
+        actions, stats = func(problem, heuristic, returnStats=True)
+    else:
+        actions, stats = func(problem, returnStats=True)
+    record['wallTime'] = time.time() - start
+    record['expanded'] = stats.expanded
+    if actions == None:
+        record['status'] = 'nosolution'
+    else:
+        record['status'] = 'ok'
+        record['pathCost'] = problem.getCostOfActions(actions)
+    record['peakRssKb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def runIsolated(target, args, record, timeout):
+    """
+    Runs target(*args + (results,)) in a child process, giving up after
+    timeout seconds.  Returns the record the child puts on results, or record
+    with its status set if the child times out or dies.
+    """
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=target, args=args + (results,))
+    worker.start()
+    deadline = time.time() + timeout
+    record = dict(record, status='timeout')
+    while time.time() < deadline:
+        try:
+            record = results.get(timeout=0.05)
+            break
+        except Queue.Empty:
+            if not worker.is_alive() and results.empty():
+                record['status'] = 'error'
+                break
+    if worker.is_alive(): worker.terminate()
+    worker.join()
+    return record
+
+def runBenchmarks(layoutNames, problemNames, algorithms, timeout):
+    records = []
+    for layoutName in layoutNames:
+        lay = layout.getLayout(layoutName)
+        for problemName in problemNames:
+            if not isApplicable(problemName, lay): continue
+            for algorithm in algorithms:
+                record = {'layout': layoutName, 'problem': problemName, 'algorithm': algorithm}
+                record = runIsolated(runOne, (layoutName, problemName, algorithm), record, timeout)
+                print formatRecord(record)
+                sys.stdout.flush()
+                records.append(record)
+    return records
+
+def runEightPuzzleBenchmarks(problemNames, algorithms, timeout):
+    "Runs every algorithm, once per heuristic if it takes one, on each EIGHT_PUZZLE_DATA puzzle"
+    records = []
+    for puzzleNumber in range(len(eightpuzzle.EIGHT_PUZZLE_DATA)):
+        for problemName in problemNames:
+            for algorithm in algorithms:
+                if isInformed(algorithm): heuristicNames = EIGHT_PUZZLE_HEURISTICS
+                else: heuristicNames = [None]
+                for heuristicName in heuristicNames:
+                    record = {'layout': 'eightpuzzle%d' % puzzleNumber, 'problem': problemName, 'algorithm': algorithm}
+                    if heuristicName != None: record['heuristic'] = heuristicName
+                    args = (puzzleNumber, problemName, algorithm, heuristicName)
+                    record = runIsolated(runEightPuzzle, args, record, timeout)
+                    print formatRecord(record)
+                    sys.stdout.flush()
+                    records.append(record)
+    return records
+
+def compareAgainstBfs(records):
+    """
+    Returns a message for each successful run other than breadth first
+    search, giving its expansions and wall time as a fraction of those of
+    breadth first search on the same layout and problem.
+    """
+    bfsRecords = dict([((r['layout'], r['problem']), r) for r in records
+                       if r['algorithm'] == 'bfs' and r['status'] == 'ok'])
+    messages = []
+    for record in records:
+        base = bfsRecords.get((record['layout'], record['problem']))
+        if record['algorithm'] == 'bfs' or record['status'] != 'ok' or base == None: continue
+        name = '%s/%s/%s' % (record['layout'], record['problem'], record['algorithm'])
+        if 'heuristic' in record: name += '/' + record['heuristic']
+        expanded = float(record['expanded']) / max(int(base['expanded']), 1)
+        wallTime = float(record['wallTime']) / max(float(base['wallTime']), MIN_TIME_DIFFERENCE)
+        messages.append('%s: %.3f of the expansions and %.3f of the time of bfs' % (name, expanded, wallTime))
+    return messages
+
+def formatRecord(record):
+    algorithm = record['algorithm']
+    if 'heuristic' in record: algorithm += '/' + record['heuristic']
+    line = '%-18s %-22s %-6s %-10s' % (record['layout'], record['problem'], algorithm, record['status'])
+    if 'wallTime' in record:
+        line += ' %8.3fs %9d expanded' % (float(record['wallTime']), int(record['expanded']))
+    if 'pathCost' in record:
+        line += ' cost %-6s' % record['pathCost']
+    if 'peakRssKb' in record:
+        line += ' %7d KB' % int(record['peakRssKb'])
+    return line
+
+def writeRecords(records, path):
+    handle = open(path, 'w')
+    try:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(handle, FIELDS)
+            writer.writeheader()
+            for record in records: writer.writerow(record)
+        else:
+            json.dump(records, handle, indent=1, sort_keys=True)
+    finally:
+        handle.close()
+
+def readRecords(path):
+    handle = open(path)
+    try:
+        if path.endswith('.csv'):
+            records = []
+            for row in csv.DictReader(handle):
+                records.append(dict([(k, v) for k, v in row.items() if v != '']))
+            return records
+        return json.load(handle)
+    finally:
+        handle.close()
+
+def compareRecords(baseline, records, threshold):
+    """
+    Returns a list of messages describing runs that got worse than the
+    baseline: runs that stopped finishing, slowed down or expanded more nodes
+    by more than the threshold fraction, or found costlier paths.
+    """
+    key = lambda r: (r['layout'], r['problem'], r['algorithm'], r.get('heuristic'))
+    old = dict([(key(r), r) for r in baseline])
+    regressions = []
+    for record in records:
+        if key(record) not in old: continue
+        base = old[key(record)]
+        name = '/'.join([part for part in key(record) if part != None])
+        if base['status'] != 'ok': continue
+        if record['status'] != 'ok':
+            regressions.append('%s: status %s (was ok)' % (name, record['status']))
+            continue
+        oldTime, newTime = float(base['wallTime']), float(record['wallTime'])
+        if newTime > oldTime * (1 + threshold) and newTime - oldTime > MIN_TIME_DIFFERENCE:
+            regressions.append('%s: wall time %.3fs (was %.3fs)' % (name, newTime, oldTime))
+        oldExpanded, newExpanded = int(base['expanded']), int(record['expanded'])
+        if newExpanded > oldExpanded * (1 + threshold):
+            regressions.append('%s: expanded %d nodes (was %d)' % (name, newExpanded, oldExpanded))
+        if float(record['pathCost']) > float(base['pathCost']):
+            regressions.append('%s: path cost %s (was %s)' % (name, record['pathCost'], base['pathCost']))
+    return regressions
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python benchmark.py <options>')
+    parser.add_option('-l', '--layouts', dest='layouts', default=None,
+                      help='Comma separated layouts to benchmark [Default: every layout]')
+    parser.add_option('-a', '--algorithms', dest='algorithms', default=None,
+                      help='Comma separated search functions [Default: %s, or %s with --eightpuzzle]' %
+                      (','.join(ALGORITHMS), ','.join(EIGHT_PUZZLE_ALGORITHMS)))
+    parser.add_option('-p', '--problems', dest='problems', default=None,
+                      help='Comma separated search problem types [Default: %s, or %s with --eightpuzzle]' %
+                      (','.join(PROBLEMS), ','.join(EIGHT_PUZZLE_PROBLEMS)))
+    parser.add_option('--eightpuzzle', dest='eightpuzzle', action='store_true', default=False,
+                      help='Benchmark on the eight puzzles in eightpuzzle.py instead of the layouts')
+    parser.add_option('--timeout', dest='timeout', type='float', default=10,
+                      help='Seconds allowed for a single run [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='Write results to this .json or .csv file')
+    parser.add_option('-c', '--compare', dest='compare', default=None,
+                      help='Baseline .json or .csv file to check for regressions')
+    parser.add_option('--threshold', dest='threshold', type='float', default=0.25,
+                      help='Fractional slowdown or extra expansions counted as a regression [Default: %default]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    if options.eightpuzzle:
+        problemNames = (options.problems or ','.join(EIGHT_PUZZLE_PROBLEMS)).split(',')
+        algorithms = (options.algorithms or ','.join(EIGHT_PUZZLE_ALGORITHMS)).split(',')
+        records = runEightPuzzleBenchmarks(problemNames, algorithms, options.timeout)
+        for message in compareAgainstBfs(records): print message
+    else:
+        if options.layouts == None: layoutNames = getLayoutNames()
+        else: layoutNames = options.layouts.split(',')
+        problemNames = (options.problems or ','.join(PROBLEMS)).split(',')
+        algorithms = (options.algorithms or ','.join(ALGORITHMS)).split(',')
+        records = runBenchmarks(layoutNames, problemNames, algorithms, options.timeout)
+    if options.output != None: writeRecords(records, options.output)
+    if options.compare != None:
+        regressions = compareRecords(readRecords(options.compare), records, options.threshold)
+        for message in regressions: print 'REGRESSION: ' + message
+        print '%d regressions against %s' % (len(regressions), options.compare)
+        if regressions: sys.exit(1)
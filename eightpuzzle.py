@@ -15,6 +15,7 @@
 
 import search
 import random
+import slidingpuzzle
 
 # Module Classes
 
@@ -197,7 +198,7 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         self.puzzle = puzzle
 
     def getStartState(self):
-        return puzzle
+        return self.puzzle
 
     def isGoalState(self,state):
         return state.isGoal()
@@ -222,6 +223,235 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         """
         return len(actions)
 
+# Packed states.  A puzzle packs into a single integer: the tile in cell i
+# (cells numbered 0 to 8 row by row) sits in bits 4i to 4i+3, and the index of
+# the blank cell in the bits above those.  Moving the blank from cell b to
+# cell c moves tile t from c to b, which adds t * (16**b - 16**c) to the
+# tiles and c - b to the blank index, so MOVE_TABLE stores those per move.
+
+TILE_BITS = 4
+BLANK_SHIFT = 9 * TILE_BITS
+
+def packPuzzle(puzzle):
+    """
+      Packs an EightPuzzleState, or a list of numbers like the one its
+    constructor takes, into an integer.
+
+    >>> unpackPuzzle(packPuzzle([1, 0, 2, 3, 4, 5, 6, 7, 8])) == loadEightPuzzle(0)
+    True
+    """
+    if isinstance(puzzle, EightPuzzleState):
+        numbers = [number for row in puzzle.cells for number in row]
+    else:
+        numbers = puzzle
+    state = numbers.index(0) << BLANK_SHIFT
+    for cell, tile in enumerate(numbers):
+        state |= tile << (TILE_BITS * cell)
+    return state
+
+def unpackPuzzle(state):
+    "Returns the EightPuzzleState for a packed state"
+    return EightPuzzleState([(state >> (TILE_BITS * cell)) & 15 for cell in range(9)])
+
+def buildMoveTable():
+    """
+      For each cell the blank can be in, the moves it can make (in the order
+    legalMoves gives them) as (move, shift of the tile to swap with, change to
+    the tiles per unit of that tile, change to the blank index) tuples.
+    """
+    table = []
+    for blank in range(9):
+        row, col = divmod(blank, 3)
+        targets = []
+        if row != 0: targets.append(('up', blank - 3))
+        if row != 2: targets.append(('down', blank + 3))
+        if col != 0: targets.append(('left', blank - 1))
+        if col != 2: targets.append(('right', blank + 1))
+        moves = []
+        for move, cell in targets:
+            factor = (1 << (TILE_BITS * blank)) - (1 << (TILE_BITS * cell))
+            moves.append((move, TILE_BITS * cell, factor, (cell - blank) << BLANK_SHIFT))
+        table.append(moves)
+    return table
+
+MOVE_TABLE = buildMoveTable()
+PACKED_GOAL = packPuzzle([0, 1, 2, 3, 4, 5, 6, 7, 8])
+
+def packedSuccessors(state):
+    """
+      Returns (successor, move) pairs for a packed state.
+
+    >>> [(unpackPuzzle(s) == loadEightPuzzle(0).result(m), m) for s, m in packedSuccessors(packPuzzle(loadEightPuzzle(0)))]
+    [(True, 'down'), (True, 'left'), (True, 'right')]
+    """
+    return [(state + ((state >> shift) & 15) * factor + blankChange, move)
+            for move, shift, factor, blankChange in MOVE_TABLE[state >> BLANK_SHIFT]]
+
+class PackedEightPuzzleSearchProblem(search.SearchProblem):
+    """
+      The Eight Puzzle as a search problem over packed states (see
+    packPuzzle), which are far cheaper to expand, hash and compare than
+    EightPuzzleState objects.  Actions are the same as in
+    EightPuzzleSearchProblem.
+    """
+    def __init__(self, puzzle):
+        "puzzle: an EightPuzzleState, list of numbers or packed state"
+        if isinstance(puzzle, (int, long)):
+            self.start = puzzle
+        else:
+            self.start = packPuzzle(puzzle)
+
+    def getStartState(self):
+        return self.start
+
+    def isGoalState(self, state):
+        return state == PACKED_GOAL
+
+    def getSuccessors(self, state):
+        return [(successor, move, 1) for successor, move in packedSuccessors(state)]
+
+    def getCostOfActions(self, actions):
+        return len(actions)
+
+def exploreStateSpace(start=PACKED_GOAL):
+    """
+      Breadth first search over every state reachable from the packed state
+    start.  Returns a dictionary from each reachable packed state to its
+    distance from start.
+
+    >>> distances = exploreStateSpace()
+    >>> len(distances), max(distances.values())
+    (181440, 31)
+    """
+    distances = {start: 0}
+    frontier = [start]
+    depth = 0
+    while frontier:
+        depth += 1
+        nextFrontier = []
+        for state in frontier:
+            for move, shift, factor, blankChange in MOVE_TABLE[state >> BLANK_SHIFT]:
+                successor = state + ((state >> shift) & 15) * factor + blankChange
+                if successor not in distances:
+                    distances[successor] = depth
+                    nextFrontier.append(successor)
+        frontier = nextFrontier
+    return distances
+
+# Heuristics.  Both work on packed states (EightPuzzleState objects are packed
+# first), and both can update their value for a single move, which
+# search.iterativeDeepeningAStarSearch takes advantage of.
+
+def buildDistanceTable():
+    "DISTANCE_TABLE[tile][cell] is the Manhattan distance from cell to tile's goal cell"
+    table = [[0] * 9]
+    for tile in range(1, 9):
+        table.append([abs(cell / 3 - tile / 3) + abs(cell % 3 - tile % 3) for cell in range(9)])
+    return table
+
+DISTANCE_TABLE = buildDistanceTable()
+
+def toPacked(state):
+    if isinstance(state, (int, long)): return state
+    return packPuzzle(state)
+
+class ManhattanHeuristic:
+    """
+      The sum over the tiles of their Manhattan distances from their goal
+    cells.  A move changes the distance of the moved tile alone, so
+    successorValue just looks up that one change.
+
+    >>> manhattanHeuristic(loadEightPuzzle(3))
+    8
+    """
+    def __call__(self, state, problem=None):
+        state = toPacked(state)
+        return sum([DISTANCE_TABLE[(state >> shift) & 15][cell]
+                    for cell, shift in enumerate(range(0, BLANK_SHIFT, TILE_BITS))])
+
+    def successorValue(self, state, value, successor, action, problem=None):
+        state, successor = toPacked(state), toPacked(successor)
+        blank, cell = state >> BLANK_SHIFT, successor >> BLANK_SHIFT
+        distances = DISTANCE_TABLE[(state >> (TILE_BITS * cell)) & 15]
+        return value + distances[blank] - distances[cell]
+
+def lineKeys(state):
+    """
+      The tiles in each row then each column of a packed state, as 12 bit
+    keys with the first cell of the line in the low bits.
+    """
+    keys = [(state >> (3 * TILE_BITS * row)) & 0xfff for row in range(3)]
+    for col in range(3):
+        keys.append(((state >> (TILE_BITS * col)) & 15) |
+                    (((state >> (TILE_BITS * (col + 3))) & 15) << 4) |
+                    (((state >> (TILE_BITS * (col + 6))) & 15) << 8))
+    return keys
+
+def lineConflicts(line, key):
+    """
+      Twice the number of tiles that must leave line (rows 0-2, then columns
+    0-2 as lines 3-5) for the tiles whose goal is in it to pass each other:
+    the tiles whose goal is in the line, less the longest run of them that
+    is already in goal order.
+    """
+    positions = []
+    for index in range(3):
+        tile = (key >> (4 * index)) & 15
+        if tile == 0: continue
+        if line < 3 and tile / 3 == line: positions.append(tile % 3)
+        if line >= 3 and tile % 3 == line - 3: positions.append(tile / 3)
+    longest = [1] * len(positions)
+    for i in range(len(positions)):
+        for j in range(i):
+            if positions[j] < positions[i]: longest[i] = max(longest[i], longest[j] + 1)
+    return 2 * (len(positions) - max(longest + [0]))
+
+class LinearConflictHeuristic(ManhattanHeuristic):
+    """
+      The Manhattan distance plus two moves for each tile that has to step
+    out of its goal row or column to let another tile in the same line past.
+    A horizontal move only changes the two columns it touches and a
+    vertical move the two rows, so successorValue only rescores those.
+
+    >>> swapped = EightPuzzleState([0, 2, 1, 3, 4, 5, 6, 7, 8])
+    >>> manhattanHeuristic(swapped), linearConflictHeuristic(swapped)
+    (2, 4)
+    """
+    def __init__(self):
+        self.table = None
+
+    def getTable(self):
+        "The conflicts for every line and key of three tiles, built on first use"
+        if self.table == None:
+            keys = [a | (b << 4) | (c << 8) for a in range(9) for b in range(9) for c in range(9)]
+            self.table = []
+            for line in range(6):
+                conflicts = [0] * (1 << 12)
+                for key in keys: conflicts[key] = lineConflicts(line, key)
+                self.table.append(conflicts)
+        return self.table
+
+    def __call__(self, state, problem=None):
+        state = toPacked(state)
+        table = self.getTable()
+        conflicts = sum([table[line][key] for line, key in enumerate(lineKeys(state))])
+        return ManhattanHeuristic.__call__(self, state) + conflicts
+
+    def successorValue(self, state, value, successor, action, problem=None):
+        state, successor = toPacked(state), toPacked(successor)
+        value = ManhattanHeuristic.successorValue(self, state, value, successor, action)
+        blank, cell = state >> BLANK_SHIFT, successor >> BLANK_SHIFT
+        if abs(blank - cell) == 1: lines = [3 + blank % 3, 3 + cell % 3]
+        else: lines = [blank / 3, cell / 3]
+        table = self.getTable()
+        before, after = lineKeys(state), lineKeys(successor)
+        for line in lines:
+            value += table[line][after[line]] - table[line][before[line]]
+        return value
+
+manhattanHeuristic = ManhattanHeuristic()
+linearConflictHeuristic = LinearConflictHeuristic()
+
 EIGHT_PUZZLE_DATA = [[1, 0, 2, 3, 4, 5, 6, 7, 8],
                      [1, 7, 8, 2, 3, 4, 5, 6, 0],
                      [4, 3, 2, 7, 0, 5, 1, 6, 8],
@@ -263,6 +493,15 @@ def createRandomEightPuzzle(moves=100):
         puzzle = puzzle.result(random.sample(puzzle.legalMoves(), 1)[0])
     return puzzle
 
+def createUniformEightPuzzle():
+    """
+      Creates a random eight puzzle drawn uniformly from
+      every solvable puzzle, without the random walk
+      createRandomEightPuzzle takes (see
+      slidingpuzzle.SlidingPuzzle.randomNumbers).
+    """
+    return EightPuzzleState(slidingpuzzle.SlidingPuzzle(3, 3).randomNumbers())
+
 if __name__ == '__main__':
     puzzle = createRandomEightPuzzle(25)
     print('A random puzzle:')
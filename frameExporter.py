@@ -0,0 +1,329 @@
+# frameExporter.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for 
+# educational purposes provided that (1) you do not distribute or publish 
+# solutions, (2) you retain this notice, and (3) you provide clear 
+# attribution to UC Berkeley, including a link to 
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero 
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and 
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+
+"""
+Records games as pictures without a Tk window, for servers with no display.
+
+An OffscreenRenderer draws the walls, food, capsules, agents and the overlay
+of expanded search cells straight into RGB buffers: NumPy arrays when NumPy
+is installed, bytearrays otherwise.  FrameExportDisplay is a display that
+renders a frame after every round of moves and hands it to a writer thread,
+so the game itself runs at full speed.  Frames go to a directory of PPM
+images, or to a video file through ffmpeg when the path has a video
+extension:
+
+> python pacman.py -p SearchAgent -l bigMaze --exportFrames frames
+> python pacman.py -l mediumClassic --exportFrames game.mp4 --exportFps 15
+"""
+import math
+import os
+import Queue
+import subprocess
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_CELL_SIZE = 8
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mkv', '.mov', '.webm', '.gif']
+QUEUE_SIZE = 64 # Frames waiting for the writer thread before the game waits for it
+
+# The colours of graphicsDisplay
+BACKGROUND_COLOR = (0, 0, 0)
+WALL_COLOR = (0, 51, 255)
+FOOD_COLOR = (255, 255, 255)
+CAPSULE_COLOR = (255, 255, 255)
+PACMAN_COLOR = (255, 255, 61)
+SCARED_COLOR = (255, 255, 255)
+EYE_COLOR = (255, 255, 255)
+GHOST_COLORS = [(229, 0, 0), (0, 76, 229), (249, 104, 17), (25, 191, 178), (255, 153, 0), (102, 33, 232)]
+
+class BytesFrame:
+    "A width by height RGB image held in a bytearray, three bytes a pixel, row by row"
+    def __init__(self, width, height, data=None):
+        self.width = width
+        self.height = height
+        if data is None: data = bytearray(width * height * 3)
+        self.data = data
+
+    def copy(self):
+        return BytesFrame(self.width, self.height, bytearray(self.data))
+
+    def fillRect(self, x0, y0, x1, y1, color):
+        "Fills the pixels from (x0, y0) up to but not including (x1, y1)"
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width), min(y1, self.height)
+        if x0 >= x1 or y0 >= y1: return
+        row = bytearray(color) * (x1 - x0)
+        for y in range(y0, y1):
+            start = (y * self.width + x0) * 3
+            self.data[start:start + len(row)] = row
+
+    def tobytes(self):
+        return self.data
+
+class ArrayFrame(BytesFrame):
+    "A BytesFrame kept as a height by width by 3 NumPy array, in data"
+    def __init__(self, width, height, data=None):
+        if data is None: data = numpy.zeros((height, width, 3), numpy.uint8)
+        BytesFrame.__init__(self, width, height, data)
+
+    def copy(self):
+        return ArrayFrame(self.width, self.height, self.data.copy())
+
+    def fillRect(self, x0, y0, x1, y1, color):
+        self.data[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)] = color
+
+    def tobytes(self):
+        return self.data.tostring()
+
+def makeFrame(width, height):
+    if numpy != None: return ArrayFrame(width, height)
+    return BytesFrame(width, height)
+
+def makeSprite(size, inside):
+    """
+    The pixels of a size by size cell for which inside(x, y) holds, with x
+    and y running from -1 to 1 across the cell and y pointing up, as a list
+    of (row, first column, column after the last) runs.
+    """
+    runs = []
+    for row in range(size):
+        y = 1 - (row + 0.5) * 2.0 / size
+        start = None
+        for col in range(size + 1):
+            x = (col + 0.5) * 2.0 / size - 1
+            if col < size and inside(x, y):
+                if start == None: start = col
+            elif start != None:
+                runs.append((row, start, col))
+                start = None
+    return runs
+
+# Angles Pacman's mouth faces for each direction; Stop closes it
+MOUTH_ANGLES = {'North': math.pi / 2, 'South': -math.pi / 2, 'East': 0.0, 'West': math.pi}
+
+def pacmanShape(direction):
+    def inside(x, y):
+        if x * x + y * y > 0.9: return False
+        if direction not in MOUTH_ANGLES or x * x + y * y < 0.02: return True
+        offset = math.atan2(y, x) - MOUTH_ANGLES[direction]
+        return abs(math.atan2(math.sin(offset), math.cos(offset))) > math.pi / 6
+    return inside
+
+def ghostShape(x, y):
+    if y > 0: return x * x + y * y < 0.72
+    return abs(x) < 0.85 and y > -0.85
+
+def eyesShape(x, y):
+    return (abs(x) - 0.35) ** 2 + (y - 0.25) ** 2 < 0.04
+
+class OffscreenRenderer:
+    """
+    Draws game states of one layout into frames, cellSize pixels a grid
+    cell.  The walls are drawn once and copied into every frame.
+    """
+    def __init__(self, layout, cellSize=DEFAULT_CELL_SIZE):
+        self.layout = layout
+        self.cellSize = cellSize
+        self.width = layout.width * cellSize
+        self.height = layout.height * cellSize
+        self.background = makeFrame(self.width, self.height)
+        self.background.fillRect(0, 0, self.width, self.height, BACKGROUND_COLOR)
+        for x in range(layout.width):
+            for y in range(layout.height):
+                if layout.walls[x][y]: self.fillCell((x, y), 0.0, WALL_COLOR, self.background)
+        self.pacmanSprites = dict([(d, makeSprite(cellSize, pacmanShape(d))) for d in MOUTH_ANGLES.keys() + ['Stop']])
+        self.ghostSprite = makeSprite(cellSize, ghostShape)
+        self.eyesSprite = makeSprite(cellSize, eyesShape)
+
+    def toPixels(self, position):
+        "The top left pixel of the cell at a grid position"
+        x, y = position
+        return int(round(x * self.cellSize)), int(round((self.layout.height - 1 - y) * self.cellSize))
+
+    def fillCell(self, position, margin, color, frame):
+        "Fills a grid cell, less margin (a fraction of the cell) on every side"
+        left, top = self.toPixels(position)
+        inset = int(margin * self.cellSize)
+        frame.fillRect(left + inset, top + inset, left + self.cellSize - inset, top + self.cellSize - inset, color)
+
+    def drawSprite(self, position, sprite, color, frame):
+        left, top = self.toPixels(position)
+        for row, start, end in sprite:
+            frame.fillRect(left + start, top + row, left + end, top + row + 1, color)
+
+    def render(self, state, expandedCells=None):
+        "Returns a new frame showing state (a GameStateData), over the expanded cells if given"
+        frame = self.background.copy()
+        if expandedCells:
+            # Earlier cells brighter, as graphicsDisplay.drawExpandedCells draws them
+            n = float(len(expandedCells))
+            for k, cell in enumerate(expandedCells):
+                self.fillCell(cell, 0.0, (int(255 * ((n - k) * .5 / n + .25)), 63, 63), frame)
+        food = state.food
+        for x in range(food.width):
+            for y in range(food.height):
+                if food[x][y]: self.fillCell((x, y), 0.4, FOOD_COLOR, frame)
+        for capsule in state.capsules:
+            self.fillCell(capsule, 0.25, CAPSULE_COLOR, frame)
+        for index, agentState in enumerate(state.agentStates):
+            if agentState.configuration == None: continue
+            position = agentState.getPosition()
+            if agentState.isPacman:
+                sprite = self.pacmanSprites.get(agentState.getDirection(), self.pacmanSprites['Stop'])
+                self.drawSprite(position, sprite, PACMAN_COLOR, frame)
+            else:
+                if agentState.scaredTimer > 0: color = SCARED_COLOR
+                else: color = GHOST_COLORS[index % len(GHOST_COLORS)]
+                self.drawSprite(position, self.ghostSprite, color, frame)
+                self.drawSprite(position, self.eyesSprite, EYE_COLOR, frame)
+        return frame
+
+class ImageSequenceWriter:
+    "Writes each frame to its own numbered PPM image in a directory"
+    def __init__(self, directory, width, height):
+        if not os.path.isdir(directory): os.makedirs(directory)
+        self.directory = directory
+        self.header = 'P6\n%d %d\n255\n' % (width, height)
+        self.count = 0
+
+    def write(self, data):
+        self.count += 1
+        handle = open(os.path.join(self.directory, 'frame_%08d.ppm' % self.count), 'wb')
+        try:
+            handle.write(self.header)
+            handle.write(data)
+        finally:
+            handle.close()
+
+    def close(self):
+        pass
+
+class VideoWriter:
+    "Pipes raw frames into an ffmpeg process that encodes them to a video file"
+    def __init__(self, path, width, height, fps):
+        command = ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                   '-s', '%dx%d' % (width, height), '-r', str(fps), '-i', '-',
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', path]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError:
+            raise Exception('Writing %s needs ffmpeg on the PATH; give a directory to write images instead' % path)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise Exception('ffmpeg failed with exit status %d' % self.process.returncode)
+
+def openWriter(path, width, height, fps):
+    if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+        return VideoWriter(path, width, height, fps)
+    return ImageSequenceWriter(path, width, height)
+
+class BackgroundWriter:
+    """
+    Hands frames to a writer on a thread of its own.  An error on that thread
+    is raised again by the next write or by close.
+    """
+    def __init__(self, writer, queueSize=QUEUE_SIZE):
+        self.writer = writer
+        self.queue = Queue.Queue(queueSize)
+        self.error = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data == None: break
+            if self.error != None: continue
+            try:
+                self.writer.write(data)
+            except Exception, e:
+                self.error = e
+        try:
+            self.writer.close()
+        except Exception, e:
+            if self.error == None: self.error = e
+
+    def write(self, data):
+        if self.error != None: raise self.error
+        self.queue.put(data)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error != None: raise self.error
+
+class FrameExportDisplay:
+    """
+    A display that renders a frame after each round of agent moves, and the
+    last state of the game, and writes them out in the background.  Each game
+    after the first goes to path with -2, -3 and so on added before the
+    extension.
+    """
+    def __init__(self, path, cellSize=DEFAULT_CELL_SIZE, fps=10):
+        self.path = path
+        self.cellSize = cellSize
+        self.fps = fps
+        self.games = 0
+        self.renderer = None
+        self.expandedCells = None
+
+    def checkNullDisplay(self):
+        return False
+
+    def getGamePath(self):
+        if self.games == 1: return self.path
+        root, extension = os.path.splitext(self.path.rstrip(os.sep))
+        return '%s-%d%s' % (root, self.games, extension)
+
+    def initialize(self, state, isBlue=False):
+        self.games += 1
+        if self.renderer == None or self.renderer.layout is not state.layout:
+            self.renderer = OffscreenRenderer(state.layout, self.cellSize)
+        self.writer = BackgroundWriter(openWriter(self.getGamePath(), self.renderer.width, self.renderer.height, self.fps))
+        self.state = state
+        self.writeFrame(state)
+
+    def writeFrame(self, state):
+        self.writer.write(self.renderer.render(state, self.expandedCells).tobytes())
+
+    def update(self, state):
+        self.state = state
+        if state._agentMoved == len(state.agentStates) - 1 or state._win or state._lose:
+            self.writeFrame(state)
+
+    def drawExpandedCells(self, cells):
+        self.expandedCells = list(cells)
+
+    def clearExpandedCells(self):
+        self.expandedCells = None
+
+    def updateDistributions(self, distributions):
+        pass
+
+    def finish(self):
+        if not (self.state._win or self.state._lose or self.state._agentMoved == len(self.state.agentStates) - 1):
+            self.writeFrame(self.state)
+        self.writer.close()
@@ -391,10 +391,14 @@ class GameStateData:
         self._win = False
         self.scoreChange = 0
 
-    def deepCopy( self ):
+    def deepCopy( self, copyLayout=True ):
+        """
+        Copies everything that changes during a game.  The layout never changes
+        once a game has started, so it may be shared with copyLayout=False.
+        """
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        if copyLayout: state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -508,12 +512,63 @@ try:
 except:
     _BOINC_ENABLED = False
 
+class GameProfiler:
+    """
+    Optional instrumentation for Game.run.  For every agent it accumulates the
+    seconds spent in each phase of a move: building the observation, the
+    agent's getAction, generateSuccessor, the display update and the rules'
+    process call.  Startup time in registerInitialState is kept as well.
+
+    If a trace file is given, one tab separated line is written per move.
+    """
+    PHASES = ['observation', 'getAction', 'generateSuccessor', 'display', 'process']
+
+    def __init__( self, numAgents, traceFile=None, gameNumber=0 ):
+        self.totals = [dict([(phase, 0.0) for phase in GameProfiler.PHASES]) for i in range(numAgents)]
+        self.startup = [0.0 for i in range(numAgents)]
+        self.moves = [0 for i in range(numAgents)]
+        self.traceFile = traceFile
+        self.gameNumber = gameNumber
+        self.tick = {}
+        if traceFile != None and traceFile.tell() == 0:
+            traceFile.write('\t'.join(['game', 'move', 'agent'] + GameProfiler.PHASES) + '\n')
+
+    def record( self, agentIndex, phase, startTime ):
+        "Charges the time elapsed since startTime to phase of the current move"
+        elapsed = time.time() - startTime
+        self.totals[agentIndex][phase] += elapsed
+        self.tick[phase] = self.tick.get(phase, 0.0) + elapsed
+
+    def recordStartup( self, agentIndex, startTime ):
+        self.startup[agentIndex] += time.time() - startTime
+
+    def endMove( self, agentIndex ):
+        if self.traceFile != None:
+            times = ['%.6f' % self.tick.get(phase, 0.0) for phase in GameProfiler.PHASES]
+            fields = [str(self.gameNumber), str(sum(self.moves)), str(agentIndex)] + times
+            self.traceFile.write('\t'.join(fields) + '\n')
+        self.moves[agentIndex] += 1
+        self.tick = {}
+
+    def summary( self ):
+        "Returns a table of total and per-move milliseconds for every agent and phase"
+        header = '%-6s %6s %9s' % ('agent', 'moves', 'startup') + ''.join([' %17s' % phase for phase in GameProfiler.PHASES])
+        lines = ['Game loop profile (total ms / ms per move)', header]
+        for agentIndex in range(len(self.moves)):
+            moves = max(1, self.moves[agentIndex])
+            line = '%-6d %6d %9.1f' % (agentIndex, self.moves[agentIndex], 1000 * self.startup[agentIndex])
+            for phase in GameProfiler.PHASES:
+                total = self.totals[agentIndex][phase]
+                line += ' %9.1f/%7.3f' % (1000 * total, 1000 * total / moves)
+            lines.append(line)
+        return '\n'.join(lines)
+
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, profiler=None, strictObservations=False, recorder=None ):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -526,6 +581,10 @@ class Game:
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
+        self.profiler = profiler
+        self.strictObservations = strictObservations
+        self.recorder = recorder
+        self.moveTimer = MoveTimer()
         import cStringIO
         self.agentOutput = [cStringIO.StringIO() for agent in agents]
 
@@ -535,6 +594,15 @@ class Game:
         else:
             return self.rules.getProgress(self)
 
+    def observe( self ):
+        """
+        Returns the copy of the current state handed to an agent.  Unless
+        strictObservations is set, copies share the (unchanging) layout rather
+        than each agent getting a private one.
+        """
+        if self.strictObservations: return self.state.deepCopy()
+        return self.state.deepCopy(copyLayout=False)
+
     def _agentCrash( self, agentIndex, quiet=False):
         "Helper method for handling agent crashes"
         if not quiet: traceback.print_exc()
@@ -566,10 +634,23 @@ class Game:
         """
         Main control loop for game play.
         """
+        if self.catchExceptions: self.moveTimer.start()
+        try:
+            self._play()
+        finally:
+            self.moveTimer.stop()
+
+    def _play( self ):
         self.display.initialize(self.state.data)
         self.numMoves = 0
+        profiler = self.profiler
 
         ###self.display.initialize(self.state.makeObservation(1).data)
+        # let agents that run elsewhere (see agentHost.py) start up together
+        for agent in self.agents:
+            if agent and "beginRegisterInitialState" in dir(agent):
+                agent.beginRegisterInitialState(self.observe())
+
         # inform learning agents of the game start
         for i in range(len(self.agents)):
             agent = self.agents[i]
@@ -582,13 +663,13 @@ class Game:
                 self._agentCrash(i, quiet=True)
                 return
             if ("registerInitialState" in dir(agent)):
+                if profiler: startTime = time.time()
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
                             start_time = time.time()
-                            timed_func(self.state.deepCopy())
+                            self.moveTimer(agent.registerInitialState, self.rules.getMaxStartupTime(i), self.observe())
                             time_taken = time.time() - start_time
                             self.totalAgentTimes[i] += time_taken
                         except TimeoutFunctionException:
@@ -602,9 +683,10 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    agent.registerInitialState(self.observe())
                 ## TODO: could this exceed the total time
                 self.unmute()
+                if profiler: profiler.recordStartup(i, startTime)
 
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
@@ -615,14 +697,14 @@ class Game:
             move_time = 0
             skip_action = False
             # Generate an observation of the state
+            if profiler: startTime = time.time()
             if 'observationFunction' in dir( agent ):
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = self.moveTimer(agent.observationFunction, self.rules.getMoveTimeout(agentIndex), self.observe())
                         except TimeoutFunctionException:
                             skip_action = True
                         move_time += time.time() - start_time
@@ -632,22 +714,23 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = agent.observationFunction(self.observe())
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observe()
+            if profiler: profiler.record(agentIndex, 'observation', startTime)
 
             # Solicit an action
+            if profiler: startTime = time.time()
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
                         start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func( observation )
+                        action = self.moveTimer(agent.getAction, self.rules.getMoveTimeout(agentIndex) - move_time, observation)
                     except TimeoutFunctionException:
                         print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
                         self.agentTimeout = True
@@ -683,9 +766,12 @@ class Game:
             else:
                 action = agent.getAction(observation)
             self.unmute()
+            if profiler: profiler.record(agentIndex, 'getAction', startTime)
 
             # Execute the action
+            if profiler: startTime = time.time()
             self.moveHistory.append( (agentIndex, action) )
+            if self.recorder: self.recorder.recordMove( agentIndex, action )
             if self.catchExceptions:
                 try:
                     self.state = self.state.generateSuccessor( agentIndex, action )
@@ -696,14 +782,22 @@ class Game:
                     return
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            if self.recorder: self.recorder.recordState( self.state )
+            if profiler: profiler.record(agentIndex, 'generateSuccessor', startTime)
 
             # Change the display
+            if profiler: startTime = time.time()
             self.display.update( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
+            if profiler: profiler.record(agentIndex, 'display', startTime)
 
             # Allow for game specific conditions (winning, losing, etc.)
+            if profiler: startTime = time.time()
             self.rules.process(self.state, self)
+            if profiler:
+                profiler.record(agentIndex, 'process', startTime)
+                profiler.endMove(agentIndex)
             # Track progress
             if agentIndex == numAgents + 1: self.numMoves += 1
             # Next agent
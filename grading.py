@@ -144,11 +144,17 @@ to follow your instructor's guidelines to receive credit on your project.
     """
     self.fail('FAIL: Exception raised: %s' % inst)
     self.addMessage('')
-    for line in traceback.format_exc().split('\n'):
+    if isinstance(inst, RemoteTestException):
+      lines = inst.remoteTraceback
+    else:
+      lines = traceback.format_exc()
+    for line in lines.split('\n'):
         self.addMessage(line)
 
   def addErrorHints(self, exceptionMap, errorInstance, questionNum):
     typeOf = str(type(errorInstance))
+    if isinstance(errorInstance, RemoteTestException):
+      typeOf = errorInstance.typeName
     questionName = 'q' + questionNum
     errorHint = ''
 
@@ -265,6 +271,55 @@ to follow your instructor's guidelines to receive credit on your project.
 
 
 
+class GradesRecorder:
+  """
+  Stands in for a Grades object while a test runs in another process.  The
+  calls the test makes on it are recorded, in order with anything the test
+  prints, so that replay() can later apply them to the real Grades object
+  exactly as if the test had run there.
+  """
+  RECORDED = ['fail', 'assignZeroCredit', 'addPoints', 'deductPoints',
+              'assignFullCredit', 'addMessage', 'addMessageToEmail']
+
+  def __init__(self, output):
+    "output: the file-like object the test's printing is captured in"
+    self.output = output
+    self.operations = []
+
+  def __getattr__(self, name):
+    if name not in GradesRecorder.RECORDED:
+      raise AttributeError(name)
+    return lambda *args, **keyArgs: self.record(name, args, keyArgs)
+
+  def record(self, name, args, keyArgs):
+    self.flushOutput()
+    self.operations.append(('call', name, args, keyArgs))
+
+  def flushOutput(self):
+    text = self.output.getvalue()
+    if text:
+      self.operations.append(('output', text))
+      self.output.truncate(0)
+
+def replay(grades, operations):
+  "Applies operations recorded by a GradesRecorder to grades"
+  for operation in operations:
+    if operation[0] == 'output':
+      sys.stdout.write(operation[1])
+    else:
+      name, args, keyArgs = operation[1:]
+      getattr(grades, name)(*args, **keyArgs)
+
+class RemoteTestException(Exception):
+  """
+  Re-raises, in the grading process, an exception a test raised while
+  running in another process.
+  """
+  def __init__(self, typeName, message, remoteTraceback):
+    Exception.__init__(self, message)
+    self.typeName = typeName
+    self.remoteTraceback = remoteTraceback
+
 class Counter(dict):
   """
   Dict with default 0
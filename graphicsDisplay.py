@@ -16,6 +16,11 @@ from graphicsUtils import *
 import math, time
 from game import Directions
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 ###########################
 #  GRAPHICS DISPLAY CODE  #
 ###########################
@@ -79,6 +84,11 @@ CAPSULE_SIZE = 0.25
 # Drawing walls
 WALL_RADIUS = 0.15
 
+# Animation: redraws closer together than FRAME_BUDGET seconds are merged, and
+# Pacman moves in at most ANIMATION_FRAMES steps, fewer if frameTime is short
+FRAME_BUDGET = 1 / 60.0
+ANIMATION_FRAMES = 4
+
 class InfoPane:
     def __init__(self, layout, gridSize):
         self.gridSize = gridSize
@@ -160,6 +170,8 @@ class PacmanGraphics:
         self.gridSize = DEFAULT_GRID_SIZE * zoom
         self.capture = capture
         self.frameTime = frameTime
+        self.lastFlush = 0.0
+        self.expandedImage = None
 
     def checkNullDisplay(self):
         return False
@@ -179,6 +191,7 @@ class PacmanGraphics:
     def startGraphics(self, state):
         self.layout = state.layout
         layout = self.layout
+        self.expandedImage = None
         self.width = layout.width
         self.height = layout.height
         self.make_window(self.width, self.height)
@@ -199,6 +212,7 @@ class PacmanGraphics:
                                 filled = 1, behind=2)
                 distx.append(block)
         self.distributionImages = dist
+        self.distributionColors = None # The colours last given to the blocks, when not all background
 
     def drawStaticObjects(self, state):
         layout = self.layout
@@ -233,6 +247,21 @@ class PacmanGraphics:
         refresh()
 
     def update(self, newState):
+        """
+          Canvas changes are batched, and only redrawn once the last agent of
+        a round has moved or FRAME_BUDGET has passed since the last redraw, so
+        a round of agent moves costs one redraw.
+        """
+        begin_batch()
+        try:
+            self.updateObjects(newState)
+        finally:
+            agentIndex = newState._agentMoved
+            flush = agentIndex == len(newState.agentStates) - 1 or time.time() - self.lastFlush >= FRAME_BUDGET
+            end_batch(flush)
+            if flush: self.lastFlush = time.time()
+
+    def updateObjects(self, newState):
         agentIndex = newState._agentMoved
         agentState = newState.agentStates[agentIndex]
 
@@ -313,14 +342,17 @@ class PacmanGraphics:
                 self.frameTime = 0.1
         if self.frameTime > 0.01 or self.frameTime < 0:
             start = time.time()
+            frameTime = abs(self.frameTime)
             fx, fy = self.getPosition(prevPacman)
             px, py = self.getPosition(pacman)
-            frames = 4.0
+            # Skip in-between frames that would have less than FRAME_BUDGET each
+            frames = float(max(1, min(ANIMATION_FRAMES, int(frameTime / FRAME_BUDGET))))
             for i in range(1,int(frames) + 1):
                 pos = px*i/frames + fx*(frames-i)/frames, py*i/frames + fy*(frames-i)/frames
                 self.movePacman(pos, self.getDirection(pacman), image)
-                refresh()
-                sleep(abs(self.frameTime) / frames)
+                # Sleeping draws the frame; only sleep off what drawing left of its share
+                sleep(max(0, start + frameTime * i / frames - time.time()))
+            self.lastFlush = time.time()
         else:
             self.movePacman(self.getPosition(pacman), self.getDirection(pacman), image)
         refresh()
@@ -562,50 +594,103 @@ class PacmanGraphics:
 
     def drawExpandedCells(self, cells):
         """
-        Draws an overlay of expanded grid positions for search agents
+        Draws an overlay of expanded grid positions for search agents.  The
+        overlay is a single image behind everything else, painted with one
+        fill per grid row (the background colour between the cells of a
+        row), rather than a canvas item per cell.
         """
         n = float(len(cells))
         baseColor = [1.0, 0.0, 0.0]
         self.clearExpandedCells()
-        self.expandedCells = []
-        for k, cell in enumerate(cells):
-            screenPos = self.to_screen( cell)
-            cellColor = formatColor(*[(n-k) * c * .5 / n + .25 for c in baseColor])
-            block = square(screenPos,
-                     0.5 * self.gridSize,
-                     color = cellColor,
-                     filled = 1, behind=2)
-            self.expandedCells.append(block)
-            if self.frameTime < 0:
+        if self.expandedImage == None:
+            width, height = self.to_screen((self.width, -1))
+            self.expandedImage = blank_image((0, 0), int(width) + 1, int(height) + 1, behind=2)[1]
+        r = 0.5 * self.gridSize
+        colors = [formatColor(*[(n-k) * c * .5 / n + .25 for c in baseColor]) for k in range(len(cells))]
+        if self.frameTime < 0:
+            # Shown a cell at a time, so painted a cell at a time
+            for cell, cellColor in zip(cells, colors):
+                x, y = self.to_screen( cell)
+                paint_rectangle(self.expandedImage, (x - r, y - r), (x + r + 1, y + r + 1), cellColor)
                 refresh()
+            return
+        rows = {}
+        for cell, cellColor in zip(cells, colors):
+            rows.setdefault(cell[1], {})[cell[0]] = cellColor # later cells over earlier ones
+        for y, row in rows.items():
+            screenY = self.to_screen((0, y))[1]
+            left = int(self.to_screen((min(row), y))[0] - r)
+            pixels = []
+            for x in sorted(row):
+                screenX = self.to_screen((x, y))[0]
+                start, end = int(screenX - r), int(screenX + r)
+                pixels.extend([BACKGROUND_COLOR] * (start - left - len(pixels)))
+                pixels.extend([row[x]] * (end - start))
+            paint_rows(self.expandedImage, (left, screenY - r), (left + len(pixels), screenY + r), pixels)
 
     def clearExpandedCells(self):
-        if 'expandedCells' in dir(self) and len(self.expandedCells) > 0:
-            for cell in self.expandedCells:
-                remove_from_screen(cell)
+        if self.expandedImage != None:
+            self.expandedImage.blank()
 
     def updateDistributions(self, distributions):
-        "Draws an agent's belief distributions"
-        # copy all distributions so we don't change their state
-        distributions = map(lambda x: x.copy(), distributions)
+        """
+        Draws an agent's belief distributions: a list of dictionaries from
+        positions to weights or, with NumPy, an array of weights stacked as
+        distribution by x by y.  Each cell mixes the agents' colours by the
+        weights it has, and only cells whose colour changed are redrawn.
+        """
         if self.distributionImages == None:
             self.drawDistributions(self.previousState)
-        for x in range(len(self.distributionImages)):
-            for y in range(len(self.distributionImages[0])):
-                image = self.distributionImages[x][y]
-                weights = [dist[ (x,y) ] for dist in distributions]
-
-                if sum(weights) != 0:
-                    pass
-                # Fog of war
-                color = [0.0,0.0,0.0]
-                colors = GHOST_VEC_COLORS[1:] # With Pacman
-                if self.capture: colors = GHOST_VEC_COLORS
-                for weight, gcolor in zip(weights, colors):
-                    color = [min(1.0, c + 0.95 * g * weight ** .3) for c,g in zip(color, gcolor)]
-                changeColor(image, formatColor(*color))
+        colors = GHOST_VEC_COLORS[1:] # With Pacman
+        if self.capture: colors = GHOST_VEC_COLORS
+        if numpy != None:
+            changes = self.getDistributionChangesArray(distributions, colors)
+        else:
+            changes = self.getDistributionChanges(distributions, colors)
+        for (x, y), color in changes:
+            changeColor(self.distributionImages[x][y], color)
         refresh()
 
+    def getDistributionChanges(self, distributions, colors):
+        "The (cell, colour) pairs of the cells whose colour changed, a cell at a time"
+        # Only the weights above zero tint a cell; items() leaves a Counter unchanged
+        totals = {}
+        for dist, gcolor in zip(distributions, colors):
+            scale = [0.95 * g for g in gcolor]
+            for position, weight in dist.items():
+                if weight == 0: continue
+                weight = weight ** .3
+                total = totals.setdefault(position, [0.0, 0.0, 0.0])
+                for i in range(3): total[i] += scale[i] * weight
+        current = {}
+        for position, total in totals.items():
+            current[position] = formatColor(*[min(1.0, c) for c in total])
+        previous = self.distributionColors or {}
+        changes = [(p, color) for p, color in current.items() if previous.get(p, BACKGROUND_COLOR) != color]
+        changes += [(p, BACKGROUND_COLOR) for p, color in previous.items() if p not in current and color != BACKGROUND_COLOR]
+        self.distributionColors = current
+        return changes
+
+    def getDistributionChangesArray(self, distributions, colors):
+        "The (cell, colour) pairs of the cells whose colour changed, with every colour found at once"
+        width, height = len(self.distributionImages), len(self.distributionImages[0])
+        if isinstance(distributions, numpy.ndarray) or (len(distributions) > 0 and isinstance(distributions[0], numpy.ndarray)):
+            weights = numpy.asarray(distributions, float)
+        else:
+            weights = numpy.zeros((len(distributions), width, height))
+            for i, dist in enumerate(distributions):
+                for (x, y), weight in dist.items():
+                    weights[i, x, y] = weight
+        count = min(len(weights), len(colors))
+        scale = 0.95 * numpy.array(colors[:count]).reshape(count, 3)
+        # Adding only tints, so capping the sum matches capping after every agent
+        rgb = numpy.minimum(1.0, numpy.tensordot(weights[:count] ** .3, scale, axes=(0, 0)))
+        rgb = (rgb * 255).astype(int)
+        previous = self.distributionColors
+        if previous is None: previous = numpy.zeros_like(rgb)
+        self.distributionColors = rgb
+        return [((x, y), '#%02x%02x%02x' % tuple(rgb[x, y])) for x, y in numpy.argwhere((rgb != previous).any(axis=2))]
+
 class FirstPersonPacmanGraphics(PacmanGraphics):
     def __init__(self, zoom = 1.0, showGhosts = True, capture = False, frameTime=0):
         PacmanGraphics.__init__(self, zoom, frameTime=frameTime)
@@ -45,7 +45,8 @@ else:
     pass # XXX need defaults here
 
 def sleep(secs):
-    global _root_window
+    global _root_window, _batch_pending
+    _batch_pending = False
     if _root_window == None:
         time.sleep(secs)
     else:
@@ -191,12 +192,73 @@ def circle(pos, r, outlineColor, fillColor, endpoints=None, style='pieslice', wi
     return _canvas.create_arc(x0, y0, x1, y1, outline=outlineColor, fill=fillColor,
                               extent=e[1] - e[0], start=e[0], style=style, width=width)
 
+def blank_image(pos, width, height, behind=0):
+    """
+    Places a transparent width by height image with its top left corner at
+    pos, returning its canvas id and the image to paint into
+    """
+    x, y = pos
+    photo = Tkinter.PhotoImage(master=_root_window, width=width, height=height)
+    id = _canvas.create_image(x, y, image=photo, anchor=Tkinter.NW)
+    if behind > 0:
+        _canvas.tag_lower(id, behind)
+    return id, photo
+
+def paint_rectangle(photo, corner, otherCorner, color):
+    "Fills a rectangle of an image's pixels, from corner up to but not including otherCorner"
+    photo.put(color, to=(int(corner[0]), int(corner[1]), int(otherCorner[0]), int(otherCorner[1])))
+
+def paint_rows(photo, corner, otherCorner, colors):
+    """
+    Fills a rectangle of an image's pixels as paint_rectangle does, with the
+    pixel colours of one row (as many as the rectangle is wide) repeated
+    down it
+    """
+    photo.put('{%s}' % ' '.join(colors), to=(int(corner[0]), int(corner[1]), int(otherCorner[0]), int(otherCorner[1])))
+
 def image(pos, file="../../blueghost.gif"):
     x, y = pos
     # img = PhotoImage(file=file)
     return _canvas.create_image(x, y, image = Tkinter.PhotoImage(file=file), anchor = Tkinter.NW)
 
+# Batching.  Between begin_batch and end_batch canvas changes neither redraw
+# the canvas nor process pending events; Tk merges the areas they touch and
+# redraws them all at once on the next flush.
+
+_batch_depth = 0
+_batch_pending = False
+
+def begin_batch():
+    global _batch_depth
+    _batch_depth += 1
+
+def end_batch(flush=True):
+    "Ends a batch, redrawing what changed during it if flush is set and no outer batch is open"
+    global _batch_depth
+    _batch_depth -= 1
+    if _batch_depth == 0 and _batch_pending and flush:
+        flush_batch()
+
+def flush_batch(d_o_e=Tkinter.tkinter.dooneevent,
+                d_w=Tkinter.tkinter.DONT_WAIT):
+    "Redraws whatever batched changes are waiting, and handles pending events"
+    global _batch_pending
+    _batch_pending = False
+    if _canvas != None:
+        _canvas.update_idletasks()
+        d_o_e(d_w)
+
+def _changed(d_o_e=Tkinter.tkinter.dooneevent,
+             d_w=Tkinter.tkinter.DONT_WAIT):
+    global _batch_pending
+    if _batch_depth > 0: _batch_pending = True
+    else: d_o_e(d_w)
+
 def refresh():
+    global _batch_pending
+    if _batch_depth > 0:
+        _batch_pending = True
+        return
     _canvas.update_idletasks()
 
 def moveCircle(id, pos, r, endpoints=None):
@@ -312,7 +374,7 @@ def remove_from_screen(x,
                        d_o_e=Tkinter.tkinter.dooneevent,
                        d_w=Tkinter.tkinter.DONT_WAIT):
     _canvas.delete(x)
-    d_o_e(d_w)
+    _changed(d_o_e, d_w)
 
 def _adjust_coords(coord_list, x, y):
     for i in range(0, len(coord_list), 2):
@@ -340,7 +402,7 @@ def move_to(object, x, y=None,
         newCoords.append(coord + inc)
 
     _canvas.coords(object, *newCoords)
-    d_o_e(d_w)
+    _changed(d_o_e, d_w)
 
 def move_by(object, x, y=None,
             d_o_e=Tkinter.tkinter.dooneevent,
@@ -361,7 +423,7 @@ def move_by(object, x, y=None,
         newCoords.append(coord + inc)
 
     _canvas.coords(object, *newCoords)
-    d_o_e(d_w)
+    _changed(d_o_e, d_w)
     if lift:
         _canvas.tag_raise(object)
 
@@ -15,6 +15,7 @@
 
 from util import manhattanDistance
 from game import Grid
+import copy
 import os
 import random
 
@@ -90,7 +91,14 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Copies the parsed board without parsing the layout text again"
+        layout = copy.copy(self)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.layoutText = self.layoutText[:]
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -142,6 +150,16 @@ def getLayout(name, back = 2):
         os.chdir(curdir)
     return layout
 
+# Layouts given as text rather than by name (as test files give them), so
+# that each is parsed only once
+LAYOUT_TEXT_CACHE = {}
+
+def getLayoutFromText(layoutText):
+    "Returns the Layout that layoutText describes; it is shared, so do not change it"
+    if layoutText not in LAYOUT_TEXT_CACHE:
+        LAYOUT_TEXT_CACHE[layoutText] = Layout([line.strip() for line in layoutText.split('\n')])
+    return LAYOUT_TEXT_CACHE[layoutText]
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
@@ -42,12 +42,13 @@ The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
 from game import GameStateData
 from game import Game
+from game import GameProfiler
 from game import Directions
 from game import Actions
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
-import sys, types, time, random, os
+import sys, types, time, random, os, itertools
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
@@ -227,9 +228,9 @@ class GameState:
         else:
             self.data = GameStateData()
 
-    def deepCopy( self ):
+    def deepCopy( self, copyLayout=True ):
         state = GameState( self )
-        state.data = self.data.deepCopy()
+        state.data = self.data.deepCopy(copyLayout)
         return state
 
     def __eq__( self, other ):
@@ -272,11 +273,11 @@ class ClassicGameRules:
     def __init__(self, timeout=30):
         self.timeout = timeout
 
-    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False):
+    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False, profiler=None, strictObservations=False, recorder=None):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize( layout, len(ghostAgents) )
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, profiler=profiler, strictObservations=strictObservations, recorder=recorder)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -513,7 +514,11 @@ def readCommand( argv ):
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file to replay', default=None)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('Move of the recorded game to start showing the replay at'), default=0)
+    parser.add_option('--replaySpeed', dest='replaySpeed', type='float',
+                      help=default('How many times faster than --frameTime to replay'), default=1.0)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -522,8 +527,22 @@ def readCommand( argv ):
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
                       help='Turns on exception handling and timeouts during games', default=False)
-    parser.add_option('--timeout', dest='timeout', type='int',
+    parser.add_option('--timeout', dest='timeout', type='float',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--strictObservations', action='store_true', dest='strictObservations',
+                      help='Gives every agent its own copy of the layout each move (for untrusted agents)', default=False)
+    parser.add_option('--isolateAgents', action='store_true', dest='isolateAgents',
+                      help='Runs every agent in its own worker process (not for keyboard agents)', default=False)
+    parser.add_option('--profileGame', action='store_true', dest='profileGame',
+                      help='Prints a breakdown of where the time in each game went', default=False)
+    parser.add_option('--profileTrace', dest='profileTrace',
+                      help='Writes per move timings of every game to this file (implies --profileGame)', default=None)
+    parser.add_option('--exportFrames', dest='exportFrames', metavar='PATH',
+                      help='Draws the games without a window into PATH, a directory of images or a video file such as game.mp4', default=None)
+    parser.add_option('--exportCellSize', dest='exportCellSize', type='int',
+                      help=default('Pixels per grid cell in exported frames'), default=8)
+    parser.add_option('--exportFps', dest='exportFps', type='int',
+                      help=default('Frames per second of exported videos'), default=10)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -532,13 +551,14 @@ def readCommand( argv ):
 
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
+    args['seed'] = options.fixRandomSeed and 'cs188' or None
 
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
 
     # Choose a Pacman agent
-    noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics)
+    noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics or options.exportFrames)
     pacmanType = loadAgent(options.pacman, noKeyboard)
     agentOpts = parseAgentArgs(options.agentArgs)
     if options.numTraining > 0:
@@ -556,13 +576,27 @@ def readCommand( argv ):
     ghostType = loadAgent(options.ghost, noKeyboard)
     args['ghosts'] = [ghostType( i+1 ) for i in range( options.numGhosts )]
 
+    # Move agents into worker processes
+    if options.isolateAgents:
+        import agentHost
+        # The engine only enforces time limits with -c; without it a slow agent just runs slowly
+        rules = None
+        if options.catchExceptions: rules = ClassicGameRules(options.timeout)
+        args['pacman'] = agentHost.RemoteAgent(args['pacman'], rules)
+        args['ghosts'] = agentHost.isolateAgents(args['ghosts'], rules)
+
     # Choose a display format
-    if options.quietGraphics:
+    if options.gameToReplay != None and options.replaySpeed > 0:
+        options.frameTime /= options.replaySpeed
+    if options.exportFrames != None:
+        import frameExporter
+        args['display'] = frameExporter.FrameExportDisplay(options.exportFrames, options.exportCellSize, options.exportFps)
+    elif options.quietGraphics:
         import textDisplay
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
         import textDisplay
-        textDisplay.SLEEP_TIME = options.frameTime
+        textDisplay.REFRESH_TIME = options.frameTime
         args['display'] = textDisplay.PacmanGraphics()
     else:
         import graphicsDisplay
@@ -571,14 +605,32 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['strictObservations'] = options.strictObservations
+    args['profile'] = options.profileGame or options.profileTrace != None
+    args['profileTrace'] = options.profileTrace
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print 'Replaying recorded game %s.' % options.gameToReplay
-        import cPickle
-        f = open(options.gameToReplay)
-        try: recorded = cPickle.load(f)
-        finally: f.close()
+        import recording
+        if recording.isRecording(options.gameToReplay):
+            reader = recording.RecordingReader(options.gameToReplay)
+            recorded = {'layout': reader.layout, 'actions': reader.iterMoves(), 'numGhosts': reader.numGhosts}
+            if options.replayFrom > 0:
+                if reader.getMove(options.replayFrom - 1) == None:
+                    raise Exception('--replayFrom %d is past the end of %s, which has %d moves' % (options.replayFrom, options.gameToReplay, len(reader.moves)))
+                # Jump to the nearest keyframe and catch up from there without drawing
+                recorded['startState'] = reader.getStateAt(options.replayFrom)
+                recorded['actions'] = itertools.islice(reader.iterMoves(), options.replayFrom, None)
+        else:
+            # Recordings made before the binary format
+            import cPickle
+            f = open(options.gameToReplay)
+            try: recorded = cPickle.load(f)
+            finally: f.close()
+            if options.replayFrom > len(recorded['actions']):
+                raise Exception('--replayFrom %d is past the end of %s, which has %d moves' % (options.replayFrom, options.gameToReplay, len(recorded['actions'])))
+            recorded['replayFrom'] = options.replayFrom
         recorded['display'] = args['display']
         replayGame(**recorded)
         sys.exit(0)
@@ -608,12 +660,25 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def replayGame( layout, actions, display ):
+def replayGame( layout, actions, display, numGhosts=None, replayFrom=0, startState=None ):
+    """
+    Shows a recorded game.  The display starts at move replayFrom; the moves
+    before it are applied without drawing them, unless the caller already
+    has the state at that point (startState) and passes only the moves after.
+    """
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
-    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
+    if numGhosts == None: numGhosts = layout.getNumGhosts()
+    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(numGhosts)]
     game = rules.newGame( layout, agents[0], agents[1:], display )
     state = game.state
+    if startState != None:
+        state = startState
+    elif replayFrom > 0:
+        for action in actions[:replayFrom]:
+            state = state.generateSuccessor( *action )
+        actions = actions[replayFrom:]
+    game.state = state
     display.initialize(state.data)
 
     for action in actions:
@@ -626,34 +691,49 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
-    import __main__
-    __main__.__dict__['_display'] = display
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, profile=False, profileTrace=None, strictObservations=False, seed=None ):
+    # Let search problems draw the cells they expand, if the display can
+    import search
+    observer = None
+    if 'drawExpandedCells' in dir(display): observer = search.ExpandedCellsObserver(display)
+    previousObserver = search.setSearchObserver(observer)
 
     rules = ClassicGameRules(timeout)
     games = []
-
-    for i in range( numGames ):
-        beQuiet = i < numTraining
-        if beQuiet:
-                # Suppress output and graphics
-            import textDisplay
-            gameDisplay = textDisplay.NullGraphics()
-            rules.quiet = True
-        else:
-            gameDisplay = display
-            rules.quiet = False
-        game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
-        game.run()
-        if not beQuiet: games.append(game)
-
-        if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+    traceFile = None
+    if profileTrace != None: traceFile = open(profileTrace, 'w')
+
+    try:
+        for i in range( numGames ):
+            beQuiet = i < numTraining
+            if beQuiet:
+                    # Suppress output and graphics
+                import textDisplay
+                gameDisplay = textDisplay.NullGraphics()
+                rules.quiet = True
+            else:
+                gameDisplay = display
+                rules.quiet = False
+            numGhosts = min(len(ghosts), layout.getNumGhosts())
+            profiler = None
+            if profile:
+                profiler = GameProfiler(1 + numGhosts, traceFile, i + 1)
+            recorder = None
+            if record:
+                import time, recording
+                fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
+                recorder = recording.RecordingWriter(fname, layout, numGhosts, seed)
+            game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions, profiler, strictObservations, recorder)
+            game.run()
+            if recorder != None: recorder.close()
+            if not beQuiet: games.append(game)
+            if profiler != None and not beQuiet: print profiler.summary()
+    finally:
+        search.setSearchObserver(previousObserver)
+        if traceFile != None: traceFile.close()
+        # Stop the worker processes of agents run elsewhere (see agentHost.py)
+        for agent in [pacman] + ghosts:
+            if agent and 'close' in dir(agent): agent.close()
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -663,7 +743,6 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         print 'Scores:       ', ', '.join([str(score) for score in scores])
         print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
         print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
-
     return games
 
 if __name__ == '__main__':
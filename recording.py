@@ -0,0 +1,261 @@
+# recording.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for 
+# educational purposes provided that (1) you do not distribute or publish 
+# solutions, (2) you retain this notice, and (3) you provide clear 
+# attribution to UC Berkeley, including a link to 
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero 
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and 
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+
+"""
+A compact, append-only file format for recorded Pacman games.
+
+A recording starts with a header:
+
+  magic 'PACREC', a version byte, then length-prefixed strings for the SHA-1
+  of the layout text, the random seed (empty if unknown) and the layout text,
+  with the number of ghosts as a varint in between.
+
+followed by one varint per move, agentIndex * 8 + action code, and an end
+marker once the game is over.  Every record is flushed as it is written, so a
+game that crashes part way through still leaves every move made before the
+crash.  Readers stop quietly at a truncated last record.
+
+Every keyframeInterval moves a keyframe record holds the whole state after
+that move (as agentHost.encodeDelta describes it, marshalled).
+
+RecordingReader streams moves back out, and rebuilds the state at any move
+number by replaying from the closest keyframe, or state it has snapshotted
+itself, at or before it.
+"""
+import hashlib
+import marshal
+
+import layout as layoutModule
+from agentHost import encodeDelta, applyDelta
+from game import Directions
+
+MAGIC = 'PACREC'
+VERSION = 2 # version 2 added keyframes
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+ACTION_CODES = dict([(action, code) for code, action in enumerate(ACTIONS)])
+OTHER_ACTION = 5 # followed by the action as a string; anything an agent returned
+KEYFRAME = 6 # followed by the marshalled state after the moves so far
+END_OF_GAME = 7
+CODE_BITS = 3
+
+CHUNK_SIZE = 4096
+
+def isRecording( path ):
+    "Returns whether path holds a recording in this format (not a pickle)"
+    f = open(path, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+def layoutHash( lay ):
+    return hashlib.sha1('\n'.join(lay.layoutText)).digest()
+
+def encodeVarint( value ):
+    bytes = []
+    while True:
+        low = value & 0x7f
+        value >>= 7
+        if value:
+            bytes.append(chr(low | 0x80))
+        else:
+            bytes.append(chr(low))
+            return ''.join(bytes)
+
+def decodeVarint( buffer, offset ):
+    """
+    Returns (value, next offset), or (None, offset) if the buffer ends part
+    way through the varint.
+    """
+    value = 0
+    shift = 0
+    while offset < len(buffer):
+        byte = ord(buffer[offset])
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80: return value, offset
+        shift += 7
+    return None, offset
+
+def encodeString( s ):
+    return encodeVarint(len(s)) + s
+
+class RecordingWriter:
+    """
+    Writes a game to a recording as it is played.  Game.run hands every move
+    to recordMove and the state it leads to to recordState.
+    """
+    def __init__( self, path, layout, numGhosts, seed=None, keyframeInterval=200 ):
+        self.file = open(path, 'wb')
+        self.keyframeInterval = keyframeInterval
+        self.numMoves = 0
+        if seed == None: seed = ''
+        header = [MAGIC, chr(VERSION), encodeString(layoutHash(layout)), encodeString(str(seed)),
+                  encodeVarint(numGhosts), encodeString('\n'.join(layout.layoutText))]
+        self.file.write(''.join(header))
+        self.file.flush()
+
+    def recordMove( self, agentIndex, action ):
+        if action in ACTION_CODES:
+            record = encodeVarint((agentIndex << CODE_BITS) | ACTION_CODES[action])
+        else:
+            if action == None: action = ''
+            record = encodeVarint((agentIndex << CODE_BITS) | OTHER_ACTION) + encodeString(str(action))
+        self.file.write(record)
+        self.file.flush()
+        self.numMoves += 1
+
+    def recordState( self, state ):
+        "Writes a keyframe of state if the last move recorded is due one"
+        if not self.keyframeInterval or self.numMoves % self.keyframeInterval != 0: return
+        self.file.write(encodeVarint(KEYFRAME) + encodeString(marshal.dumps(encodeDelta(None, state))))
+        self.file.flush()
+
+    def close( self ):
+        "Marks the game as finished and closes the file"
+        self.file.write(encodeVarint(END_OF_GAME))
+        self.file.close()
+
+class RecordingReader:
+    """
+    Reads a recording written by RecordingWriter.  The header is read on
+    construction; moves are read from the file as they are needed.
+    """
+    def __init__( self, path, snapshotInterval=100 ):
+        self.file = open(path, 'rb')
+        self.buffer = ''
+        self.offset = 0
+        self.finished = False # the end marker or the end of the file was reached
+        self.complete = False # the end marker was read
+        self.moves = []
+        self.keyframes = {} # move number -> marshalled state after that many moves
+        self.snapshotInterval = snapshotInterval
+        self.snapshots = {}
+
+        if self._read(len(MAGIC)) != MAGIC:
+            raise Exception('%s is not a Pacman recording' % path)
+        self.version = ord(self._read(1))
+        if self.version > VERSION:
+            raise Exception('%s was recorded in format version %d; only versions up to %d can be read' % (path, self.version, VERSION))
+        self.layoutHash = self._readString()
+        self.seed = self._readString() or None
+        self.numGhosts = self._readVarint()
+        self.layout = layoutModule.Layout(self._readString().split('\n'))
+        if layoutHash(self.layout) != self.layoutHash:
+            raise Exception('%s: the layout does not match its hash' % path)
+
+    def close( self ):
+        self.file.close()
+
+    def iterMoves( self ):
+        "Yields the (agentIndex, action) moves of the game in order, reading as it goes"
+        index = 0
+        while True:
+            while index >= len(self.moves):
+                if self.finished or not self._readMove(): return
+            yield self.moves[index]
+            index += 1
+
+    def getMove( self, n ):
+        "Returns move n (counting from 0), or None if the game has fewer moves"
+        while n >= len(self.moves):
+            if self.finished or not self._readMove(): return None
+        return self.moves[n]
+
+    def getInitialState( self ):
+        import pacman
+        state = pacman.GameState()
+        state.initialize(self.layout, self.numGhosts)
+        return state
+
+    def getStateAt( self, n ):
+        """
+        Returns the state after the first n moves, replaying from the latest
+        keyframe or snapshot before it.  Snapshots are kept every
+        snapshotInterval moves.
+        """
+        if 0 not in self.snapshots: self.snapshots[0] = self.getInitialState()
+        # reads any keyframes up to move n
+        if n > 0 and self.getMove(n - 1) == None:
+            raise IndexError('Move %d is past the end of the recording, which has %d moves' % (n, len(self.moves)))
+        start = max([i for i in self.snapshots if i <= n])
+        keyframe = max([i for i in self.keyframes if i <= n] + [-1])
+        if keyframe > start:
+            start = keyframe
+            self.snapshots[start] = applyDelta(self.snapshots[0], marshal.loads(self.keyframes[start]))
+        state = self.snapshots[start]
+        for i in range(start, n):
+            state = state.generateSuccessor(*self.getMove(i))
+            if (i + 1) % self.snapshotInterval == 0: self.snapshots[i + 1] = state
+        return state
+
+    def _fill( self ):
+        "Reads more of the file into the buffer; returns False at the end of the file"
+        data = self.file.read(CHUNK_SIZE)
+        if not data: return False
+        self.buffer = self.buffer[self.offset:] + data
+        self.offset = 0
+        return True
+
+    def _read( self, size ):
+        while len(self.buffer) - self.offset < size:
+            if not self._fill(): raise Exception('The recording is truncated')
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def _readVarint( self ):
+        while True:
+            value, offset = decodeVarint(self.buffer, self.offset)
+            if value != None:
+                self.offset = offset
+                return value
+            if not self._fill(): return None
+
+    def _readString( self ):
+        length = self._readVarint()
+        if length == None: raise Exception('The recording ends inside a record')
+        return self._read(length)
+
+    def _readMove( self ):
+        "Reads the next move into self.moves; returns False when there are no more"
+        value = self._readVarint()
+        while value == KEYFRAME:
+            try:
+                self.keyframes[len(self.moves)] = self._readString()
+            except Exception:
+                self.finished = True
+                return False
+            value = self._readVarint()
+        if value == None or value == END_OF_GAME:
+            self.finished = True
+            self.complete = value == END_OF_GAME
+            return False
+        agentIndex, code = value >> CODE_BITS, value & ((1 << CODE_BITS) - 1)
+        if code == OTHER_ACTION:
+            try:
+                action = self._readString() or None
+            except Exception:
+                # A truncated last record
+                self.finished = True
+                return False
+        elif code < len(ACTIONS):
+            action = ACTIONS[code]
+        else:
+            raise Exception('Unknown record type %d in recording' % code)
+        self.moves.append((agentIndex, action))
+        return True
@@ -19,6 +19,9 @@ by Pacman agents (in searchAgents.py).
 
 import util
 import code
+import time
+import collections
+import json
 
 class SearchProblem:
     """
@@ -82,27 +85,167 @@ def getActions(state, start, end):
 
   return actions
 
+class SearchStats:
+    """
+    Counters and timings collected during a single search run.  Every search
+    function in this file fills one in; pass returnStats=True to get it back
+    alongside the list of actions.
+
+    Times are kept per phase ('search', 'goalTest', 'expand', 'heuristic') as
+    both wall clock and CPU seconds.
+    """
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.frontier = 0
+        self.maxFrontier = 0
+        self.maxClosed = 0
+        self.heuristicCalls = 0
+        self.heuristicHits = 0
+        self.wallTime = {}
+        self.cpuTime = {}
+
+    def recordPush(self):
+        self.frontier += 1
+        if self.frontier > self.maxFrontier: self.maxFrontier = self.frontier
+
+    def recordPop(self):
+        self.frontier -= 1
+
+    def recordClosed(self, size):
+        if size > self.maxClosed: self.maxClosed = size
+
+    def addTime(self, phase, wallStart, cpuStart):
+        "Charges the time elapsed since (wallStart, cpuStart) to phase"
+        self.wallTime[phase] = self.wallTime.get(phase, 0.0) + time.time() - wallStart
+        self.cpuTime[phase] = self.cpuTime.get(phase, 0.0) + time.clock() - cpuStart
+
+    def recordHeuristic(self, heuristic):
+        "Copies the counters of a CachedHeuristic into these statistics"
+        self.heuristicCalls += heuristic.calls
+        self.heuristicHits += heuristic.hits
+        self.wallTime['heuristic'] = self.wallTime.get('heuristic', 0.0) + heuristic.time
+        self.cpuTime['heuristic'] = self.cpuTime.get('heuristic', 0.0) + heuristic.cpuTime
+
+    def toDict(self):
+        return {'expanded': self.expanded,
+                'generated': self.generated,
+                'duplicates': self.duplicates,
+                'maxFrontier': self.maxFrontier,
+                'maxClosed': self.maxClosed,
+                'heuristicCalls': self.heuristicCalls,
+                'heuristicHits': self.heuristicHits,
+                'wallTime': dict(self.wallTime),
+                'cpuTime': dict(self.cpuTime)}
+
+    def toJson(self):
+        return json.dumps(self.toDict(), sort_keys=True)
+
+    def __str__(self):
+        lines = ['Search nodes expanded: %d' % self.expanded,
+                 'Search nodes generated: %d (%d duplicate pushes)' % (self.generated, self.duplicates),
+                 'Peak frontier size: %d, peak closed set size: %d' % (self.maxFrontier, self.maxClosed)]
+        if self.heuristicCalls > 0:
+            hitRate = 100.0 * self.heuristicHits / self.heuristicCalls
+            lines.append('Heuristic evaluations: %d (%.1f%% cache hits)' % (self.heuristicCalls, hitRate))
+        phases = ['%s %.3f/%.3f' % (p, self.wallTime[p], self.cpuTime[p]) for p in sorted(self.wallTime)]
+        lines.append('Seconds (wall/cpu): ' + ', '.join(phases))
+        return '\n'.join(lines)
+
 def search(problem, Q, update=lambda l: l['child'] not in l['closed'], enqueue=lambda l, node, cost: l['Q'].push((node, cost)),
-    costMetric=lambda l, node, rootCost: 0):
-  start = problem.getStartState()
-  closed = set()
-  state = {}
-  cost = 0
-  enqueue(locals(), start, costMetric(locals(), start, 0))
-  while not Q.isEmpty():
-    node, rootCost = Q.pop()
-    if not node in closed:
-      closed.add(node)
-     # print "Dequeueing: " + str((node, rootCost))
-      if problem.isGoalState(node): return getActions(state, start, node)
-      for (child, action, cost) in problem.getSuccessors(node):
-        totalCost = costMetric(locals(), child, rootCost)
-        if update(locals()):
-          enqueue(locals(), child, totalCost)
-      #    print "Queuing: " + str( (child, totalCost)) + "with cost " + str(cost)
-          state[child] = (node, action, totalCost)
-
-def depthFirstSearch(problem):
+    costMetric=lambda l, node, rootCost: 0, stats=None):
+  if stats == None: stats = SearchStats()
+  searchWall, searchCpu = time.time(), time.clock()
+  try:
+    start = problem.getStartState()
+    closed = set()
+    state = {}
+    cost = 0
+    enqueue(locals(), start, costMetric(locals(), start, 0))
+    stats.recordPush()
+    while not Q.isEmpty():
+      node, rootCost = Q.pop()
+      stats.recordPop()
+      if not node in closed:
+        closed.add(node)
+        stats.recordClosed(len(closed))
+       # print "Dequeueing: " + str((node, rootCost))
+        wall, cpu = time.time(), time.clock()
+        isGoal = problem.isGoalState(node)
+        stats.addTime('goalTest', wall, cpu)
+        if isGoal: return getActions(state, start, node)
+        wall, cpu = time.time(), time.clock()
+        successors = problem.getSuccessors(node)
+        stats.addTime('expand', wall, cpu)
+        stats.expanded += 1
+        for (child, action, cost) in successors:
+          stats.generated += 1
+          totalCost = costMetric(locals(), child, rootCost)
+          if update(locals()):
+            if child in state or child == start: stats.duplicates += 1
+            enqueue(locals(), child, totalCost)
+            stats.recordPush()
+        #    print "Queuing: " + str( (child, totalCost)) + "with cost " + str(cost)
+            state[child] = (node, action, totalCost)
+  finally:
+    stats.addTime('search', searchWall, searchCpu)
+
+class SearchObserver:
+    """
+    Watches search problems for visualisation.  Problems that support it
+    report each state they expand, and each goal they reach, to the observer
+    that was attached with setSearchObserver when they were created.  With no
+    observer attached they skip the reporting altogether.
+    """
+    def expanded(self, problem, state):
+        pass
+
+    def reachedGoal(self, problem, state):
+        pass
+
+class ExpandedCellsObserver(SearchObserver):
+    """
+    Keeps the order in which a problem first expanded its states and, each
+    time the problem reaches a goal, has the display draw them as expanded
+    cells.
+    """
+    def __init__(self, display):
+        self.display = display
+        self.problem = None
+
+    def watch(self, problem):
+        if problem is not self.problem:
+            self.problem, self.visited, self.visitedList = problem, set(), []
+
+    def expanded(self, problem, state):
+        self.watch(problem)
+        if state not in self.visited:
+            self.visited.add(state)
+            self.visitedList.append(state)
+
+    def reachedGoal(self, problem, state):
+        self.watch(problem)
+        self.visitedList.append(state)
+        self.display.drawExpandedCells(self.visitedList)
+
+_observer = None
+
+def setSearchObserver(observer):
+    "Attaches observer to search problems created from now on (None for none), returning the one it replaces"
+    global _observer
+    previous, _observer = _observer, observer
+    return previous
+
+def getSearchObserver():
+    return _observer
+
+def searchResult(actions, stats, returnStats):
+    "Returns the actions, paired with the run's SearchStats if they were requested"
+    if returnStats: return actions, stats
+    return actions
+
+def depthFirstSearch(problem, returnStats=False):
     """
     Search the deepest nodes in the search tree first
 
@@ -116,18 +259,23 @@ def depthFirstSearch(problem):
     print "Is the start a goal?", problem.isGoalState(problem.getStartState())
     print "Start's successors:", problem.getSuccessors(problem.getStartState())
     """
-    return search(problem, util.Stack())
+    stats = SearchStats()
+    return searchResult(search(problem, util.Stack(), stats=stats), stats, returnStats)
 
-def breadthFirstSearch(problem):
+def breadthFirstSearch(problem, returnStats=False):
     """
     Search the shallowest nodes in the search tree first.
     """
-    return search(problem, util.Queue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'])
+    stats = SearchStats()
+    actions = search(problem, util.Queue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'], stats=stats)
+    return searchResult(actions, stats, returnStats)
 
-def uniformCostSearch(problem):
+def uniformCostSearch(problem, returnStats=False):
     "Search the node of least total cost first. "
-    return search(problem, util.PriorityQueue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'] or ( l['child'] in l['state'] and l['totalCost'] < l['state'][l['child']][2]),
-        enqueue=lambda l, node, cost: l['Q'].push((node, cost), cost), costMetric=lambda l, node, rootCost: rootCost + l['cost'])
+    stats = SearchStats()
+    actions = search(problem, util.PriorityQueue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'] or ( l['child'] in l['state'] and l['totalCost'] < l['state'][l['child']][2]),
+        enqueue=lambda l, node, cost: l['Q'].push((node, cost), cost), costMetric=lambda l, node, rootCost: rootCost + l['cost'], stats=stats)
+    return searchResult(actions, stats, returnStats)
 
 def nullHeuristic(state, problem=None):
     """
@@ -136,13 +284,119 @@ def nullHeuristic(state, problem=None):
     """
     return 0
 
-def aStarSearch(problem, heuristic=nullHeuristic):
+class CachedHeuristic:
+    """
+    Wraps a heuristic so that it is evaluated at most once per state while
+    the state stays in a bounded least-recently-used cache.  The wrapper also
+    counts calls and cache hits and accumulates the time spent inside the
+    wrapped heuristic.
+
+    States that cannot be hashed are passed straight through to the heuristic.
+    """
+    def __init__(self, heuristic, maxSize=100000):
+        self.heuristic = heuristic
+        self.maxSize = maxSize
+        self.cache = collections.OrderedDict()
+        self.calls = 0
+        self.hits = 0
+        self.time = 0.0
+        self.cpuTime = 0.0
+
+    def __call__(self, state, problem=None):
+        self.calls += 1
+        try:
+            value = self.cache.pop(state)
+            self.hits += 1
+        except KeyError:
+            value = self._evaluate(state, problem)
+            if len(self.cache) >= self.maxSize: self.cache.popitem(last=False)
+        except TypeError:
+            return self._evaluate(state, problem)
+        self.cache[state] = value
+        return value
+
+    def _evaluate(self, state, problem):
+        start, cpuStart = time.time(), time.clock()
+        value = self.heuristic(state, problem)
+        self.time += time.time() - start
+        self.cpuTime += time.clock() - cpuStart
+        return value
+
+    def getHitRate(self):
+        if self.calls == 0: return 0.0
+        return float(self.hits) / self.calls
+
+    def __str__(self):
+        return '%d calls, %.1f%% cache hits, %.3f seconds' % (self.calls, 100 * self.getHitRate(), self.time)
+
+def aStarSearch(problem, heuristic=nullHeuristic, returnStats=False):
     "Search the node that has the lowest combined cost and heuristic first."
-    return search(problem, util.PriorityQueue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'] or ( l['child'] in l['state'] and l['totalCost'] < l['state'][l['child']][2]),
-        enqueue=lambda l, node, cost: l['Q'].push((node, cost - heuristic(node, l['problem'])), cost), costMetric=lambda l, node, rootCost: rootCost + l['cost'] + heuristic(node, l['problem']))
+    if not isinstance(heuristic, CachedHeuristic): heuristic = CachedHeuristic(heuristic)
+    stats = SearchStats()
+    actions = search(problem, util.PriorityQueue(), lambda l: l['child'] not in l['closed'] and l['child'] not in l['state'] or ( l['child'] in l['state'] and l['totalCost'] < l['state'][l['child']][2]),
+        enqueue=lambda l, node, cost: l['Q'].push((node, cost - heuristic(node, l['problem'])), cost), costMetric=lambda l, node, rootCost: rootCost + l['cost'] + heuristic(node, l['problem']), stats=stats)
+    stats.recordHeuristic(heuristic)
+    return searchResult(actions, stats, returnStats)
+
+def iterativeDeepeningAStarSearch(problem, heuristic=nullHeuristic, returnStats=False):
+    """
+    Repeated depth first searches that cut off nodes whose cost plus heuristic
+    exceeds a bound, raising the bound each round to the smallest value that
+    was cut off.  With an admissible heuristic the first solution found is
+    optimal, and memory grows only with the depth of the search: the states
+    on the current path are kept to avoid cycles, nothing else.
+
+    Heuristics that define successorValue(state, value, successor, action,
+    problem) have it called with the parent's value for each successor,
+    letting them update the value for the move instead of recomputing it.
+    """
+    stats = SearchStats()
+    searchWall, searchCpu = time.time(), time.clock()
+    updateValue = getattr(heuristic, 'successorValue', None)
+    try:
+        start = problem.getStartState()
+        startValue = heuristic(start, problem)
+        bound = startValue
+        while True:
+            nextBound = None
+            # Each entry is (state, cost so far, heuristic value, depth, action into state)
+            stack = [(start, 0, startValue, 0, None)]
+            stats.recordPush()
+            path, actions, onPath = [], [], set()
+            while stack:
+                node, cost, value, depth, action = stack.pop()
+                stats.recordPop()
+                while len(path) > depth:
+                    onPath.discard(path.pop())
+                    if actions: actions.pop()
+                if cost + value > bound:
+                    if nextBound == None or cost + value < nextBound: nextBound = cost + value
+                    continue
+                if action != None: actions.append(action)
+                if problem.isGoalState(node):
+                    return searchResult(list(actions), stats, returnStats)
+                path.append(node)
+                onPath.add(node)
+                stats.recordClosed(len(onPath))
+                successors = problem.getSuccessors(node)
+                stats.expanded += 1
+                for child, childAction, stepCost in reversed(successors):
+                    stats.generated += 1
+                    if child in onPath:
+                        stats.duplicates += 1
+                        continue
+                    if updateValue != None: childValue = updateValue(node, value, child, childAction, problem)
+                    else: childValue = heuristic(child, problem)
+                    stack.append((child, cost + stepCost, childValue, depth + 1, childAction))
+                    stats.recordPush()
+            if nextBound == None: return searchResult(None, stats, returnStats)
+            bound = nextBound
+    finally:
+        stats.addTime('search', searchWall, searchCpu)
 
 # Abbreviations
 bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+idastar = iterativeDeepeningAStarSearch
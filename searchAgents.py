@@ -42,6 +42,7 @@ import time
 import search
 import math
 import code
+import collections
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -71,6 +72,7 @@ class SearchAgent(Agent):
 
     Note: You should NOT change any code in SearchAgent
     """
+    searchReturnsStats = False # True if searchFunction accepts returnStats=True
 
     def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
@@ -79,6 +81,7 @@ class SearchAgent(Agent):
         if fn not in dir(search):
             raise AttributeError, fn + ' is not a search function in search.py.'
         func = getattr(search, fn)
+        self.searchReturnsStats = 'returnStats' in func.func_code.co_varnames
         if 'heuristic' not in func.func_code.co_varnames:
             print('[SearchAgent] using function ' + fn)
             self.searchFunction = func
@@ -91,7 +94,7 @@ class SearchAgent(Agent):
                 raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            self.searchFunction = lambda x, **kwargs: func(x, heuristic=heur, **kwargs)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -110,10 +113,14 @@ class SearchAgent(Agent):
         if self.searchFunction == None: raise Exception, "No search function provided for SearchAgent"
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
-        self.actions  = self.searchFunction(problem) # Find a path
+        if self.searchReturnsStats:
+            self.actions, self.searchStats = self.searchFunction(problem, returnStats=True) # Find a path
+        else:
+            self.actions, self.searchStats = self.searchFunction(problem), None
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
-        if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if self.searchStats != None: print(self.searchStats)
+        elif '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
 
     def getAction(self, state):
         """
@@ -140,6 +147,7 @@ class PositionSearchProblem(search.SearchProblem):
 
     Note: this search problem is fully specified; you should NOT change it.
     """
+    observer = None # The search.SearchObserver to report to, if any
 
     def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
         """
@@ -159,7 +167,8 @@ class PositionSearchProblem(search.SearchProblem):
             print 'Warning: this does not look like a regular search maze'
 
         # For display purposes
-        self._visited, self._visitedlist, self._expanded = {}, [], 0
+        if visualize: self.observer = search.getSearchObserver()
+        self._expanded = 0
 
     def getStartState(self):
         return self.startState
@@ -168,12 +177,8 @@ class PositionSearchProblem(search.SearchProblem):
         isGoal = state == self.goal
 
         # For display purposes only
-        if isGoal and self.visualize:
-            self._visitedlist.append(state)
-            import __main__
-            if '_display' in dir(__main__):
-                if 'drawExpandedCells' in dir(__main__._display): #@UndefinedVariable
-                    __main__._display.drawExpandedCells(self._visitedlist) #@UndefinedVariable
+        if isGoal and self.observer != None:
+            self.observer.reachedGoal(self, state)
 
         return isGoal
 
@@ -201,9 +206,8 @@ class PositionSearchProblem(search.SearchProblem):
 
         # Bookkeeping for display purposes
         self._expanded += 1
-        if state not in self._visited:
-            self._visited[state] = True
-            self._visitedlist.append(state)
+        if self.observer != None:
+            self.observer.expanded(self, state)
 
         return successors
 
@@ -230,6 +234,8 @@ class StayEastSearchAgent(SearchAgent):
 
     The cost function for stepping into a position (x,y) is 1/2^x.
     """
+    searchReturnsStats = True
+
     def __init__(self):
         self.searchFunction = search.uniformCostSearch
         costFn = lambda pos: .5 ** pos[0]
@@ -242,6 +248,8 @@ class StayWestSearchAgent(SearchAgent):
 
     The cost function for stepping into a position (x,y) is 2^x.
     """
+    searchReturnsStats = True
+
     def __init__(self):
         self.searchFunction = search.uniformCostSearch
         costFn = lambda pos: 2 ** pos[0]
@@ -361,8 +369,10 @@ def cornersHeuristic(state, problem):
 
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
+    searchReturnsStats = True
+
     def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic)
+        self.searchFunction = lambda prob, **kwargs: search.aStarSearch(prob, cornersHeuristic, **kwargs)
         self.searchType = CornersProblem
 
 class FoodSearchProblem:
@@ -417,8 +427,10 @@ class FoodSearchProblem:
 
 class AStarFoodSearchAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
+    searchReturnsStats = True
+
     def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, foodHeuristic)
+        self.searchFunction = lambda prob, **kwargs: search.aStarSearch(prob, foodHeuristic, **kwargs)
         self.searchType = FoodSearchProblem
 
 def foodHeuristic(state, problem):
@@ -455,27 +467,120 @@ class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
     def registerInitialState(self, state):
         self.actions = []
-        currentState = state
-        while(currentState.getFood().count() > 0):
-            nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
+        walls = state.getWalls()
+        field = NearestFoodField(walls, state.getFood())
+        position = state.getPacmanPosition()
+        while field.foodCount() > 0:
+            nextPathSegment = field.pathToClosestDot(position)
+            if nextPathSegment == None:
+                raise Exception, 'findPathToClosestDot found no reachable food from %s' % str(position)
             self.actions += nextPathSegment
             for action in nextPathSegment:
-                legal = currentState.getLegalActions()
-                if action not in legal:
-                    t = (str(action), str(currentState))
-                    raise Exception, 'findPathToClosestDot returned an illegal move: %s!\n%s' % t
-                currentState = currentState.generateSuccessor(0, action)
+                x, y = Actions.getSuccessor(position, action)
+                if walls[int(x)][int(y)]:
+                    t = (str(action), str(position))
+                    raise Exception, 'findPathToClosestDot returned an illegal move: %s at %s!' % t
+                position = (int(x), int(y))
+            field.eat(position)
         self.actionIndex = 0
         print 'Path found with cost %d.' % len(self.actions)
 
     def findPathToClosestDot(self, gameState):
         "Returns a path (a list of actions) to the closest dot, starting from gameState"
-        # Here are some useful elements of the startState
-        startPosition = gameState.getPacmanPosition()
-        food = gameState.getFood()
-        walls = gameState.getWalls()
-        problem = AnyFoodSearchProblem(gameState)
-        return search.aStarSearch(problem)
+        field = NearestFoodField(gameState.getWalls(), gameState.getFood())
+        return field.pathToClosestDot(gameState.getPacmanPosition())
+
+class NearestFoodField:
+    """
+    A distance field holding, for every open square, the maze distance to the
+    nearest remaining food.  The field is built once by a multi-source breadth
+    first search from all of the food and is repaired locally when a dot is
+    eaten, so repeated closest-dot queries never search the whole maze again.
+
+    A path to the closest dot is read off the field by walking downhill from
+    Pacman's position.
+    """
+    UNREACHABLE = 999999
+
+    def __init__(self, walls, food):
+        self.walls = walls
+        self.food = set(food.asList())
+        self.distance = {}
+        self.source = {}
+        self.owned = {} # food position -> squares for which it is the nearest food
+        self._propagate([(pos, pos) for pos in self.food], 0)
+
+    def foodCount(self):
+        return len(self.food)
+
+    def distanceTo(self, position):
+        "Returns the maze distance from position to the nearest food."
+        return self.distance.get(position, NearestFoodField.UNREACHABLE)
+
+    def pathToClosestDot(self, position):
+        """
+        Returns a shortest list of actions leading from position to the closest
+        food, or None if no food can be reached.  Ties are broken in the same
+        North, South, East, West order used by the search problems.
+        """
+        d = self.distanceTo(position)
+        if d == NearestFoodField.UNREACHABLE: return None
+        actions = []
+        while d > 0:
+            x, y = position
+            for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                dx, dy = Actions._directions[action]
+                nextPos = (x + dx, y + dy)
+                if self.distanceTo(nextPos) == d - 1:
+                    break
+            actions.append(action)
+            position, d = nextPos, d - 1
+        return actions
+
+    def eat(self, position):
+        """
+        Removes the food at position and repairs the distance field.  Only the
+        squares whose nearest food was the eaten dot are recomputed; they are
+        reseeded from their unaffected neighbours.
+        """
+        if position not in self.food: return
+        self.food.remove(position)
+        affected = self.owned.pop(position, set())
+        for pos in affected:
+            del self.distance[pos]
+            del self.source[pos]
+        seeds = []
+        for pos in affected:
+            for neighbor in Actions.getLegalNeighbors(pos, self.walls):
+                if neighbor in self.distance:
+                    seeds.append((self.distance[neighbor] + 1, pos, self.source[neighbor]))
+        seeds.sort()
+        self._propagate([(pos, src) for d, pos, src in seeds], [d for d, pos, src in seeds])
+
+    def _propagate(self, seeds, distances):
+        """
+        Breadth first relaxation from (position, source) seeds.  distances is
+        either a single starting distance shared by every seed or a sorted list
+        of per-seed distances; seeds are merged into the frontier in order so
+        each square is settled with its true distance.
+        """
+        if type(distances) == type(0): distances = [distances] * len(seeds)
+        frontier = collections.deque()
+        i = 0
+        while i < len(seeds) or frontier:
+            if i < len(seeds) and (not frontier or distances[i] <= frontier[0][2]):
+                pos, src = seeds[i]
+                d = distances[i]
+                i += 1
+            else:
+                pos, src, d = frontier.popleft()
+            if pos in self.distance: continue
+            self.distance[pos] = d
+            self.source[pos] = src
+            self.owned.setdefault(src, set()).add(pos)
+            for neighbor in Actions.getLegalNeighbors(pos, self.walls):
+                if neighbor not in self.distance:
+                    frontier.append((neighbor, src, d + 1))
 
 class AnyFoodSearchProblem(PositionSearchProblem):
     """
@@ -501,7 +606,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         self.walls = gameState.getWalls()
         self.startState = gameState.getPacmanPosition()
         self.costFn = lambda x: 1
-        self._visited, self._visitedlist, self._expanded = {}, [], 0
+        self._expanded = 0
 
     def isGoalState(self, state):
         """
@@ -32,6 +32,22 @@ def wrap_solution(solution):
 
 
 
+# Start states of the layouts given in test files, by layout text.  Many tests
+# share a layout, and solution generation builds each one twice, so each
+# layout is parsed once (by layout.getLayoutFromText, which batch grading
+# fills before starting any submission) and tests get their own copy of its
+# start state.
+START_STATES = {}
+
+def getLayoutStartState(layoutText):
+    "Returns a fresh GameState at the start of the layout described by layoutText"
+    if layoutText not in START_STATES:
+        lay = layout.getLayoutFromText(layoutText)
+        gameState = pacman.GameState()
+        gameState.initialize(lay, 0)
+        START_STATES[layoutText] = gameState
+    return START_STATES[layoutText].deepCopy()
+
 def followAction(state, action, problem):
   for successor1, action1, cost1 in problem.getSuccessors(state):
     if action == action1: return successor1
@@ -270,9 +286,7 @@ class PacmanSearchTest(testClasses.TestCase):
 
     def getSolInfo(self, search, searchAgents):
         alg = getattr(search, self.alg)
-        lay = layout.Layout([l.strip() for l in self.layout_text.split('\n')])
-        start_state = pacman.GameState()
-        start_state.initialize(lay, 0)
+        start_state = getLayoutStartState(self.layout_text)
 
         problemClass = getattr(searchAgents, self.searchProblemClassName)
         problemOptions = {}
@@ -387,14 +401,11 @@ class CornerProblemTest(testClasses.TestCase):
         self.layoutName = testDict['layoutName']
 
     def solution(self, search, searchAgents):
-        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
-        gameState = pacman.GameState()
-        gameState.initialize(lay, 0)
+        gameState = getLayoutStartState(self.layoutText)
         problem = searchAgents.CornersProblem(gameState)
         path = search.bfs(problem)
 
-        gameState = pacman.GameState()
-        gameState.initialize(lay, 0)
+        gameState = getLayoutStartState(self.layoutText)
         visited = getStatesFromPath(gameState.getPacmanPosition(), path)
         top, right = gameState.getWalls().height-2, gameState.getWalls().width-2
         missedCorners = [p for p in ((1,1), (1,top), (right, 1), (right, top)) if p not in visited]
@@ -475,9 +486,7 @@ class HeuristicTest(testClasses.TestCase):
         self.heuristicName = testDict['heuristic']
 
     def setupProblem(self, searchAgents):
-        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
-        gameState = pacman.GameState()
-        gameState.initialize(lay, 0)
+        gameState = getLayoutStartState(self.layoutText)
         problemClass = getattr(searchAgents, self.searchProblemClassName)
         problem = problemClass(gameState)
         state = problem.getStartState()
@@ -559,9 +568,7 @@ class HeuristicGrade(testClasses.TestCase):
         self.thresholds = [int(t) for t in testDict['gradingThresholds'].split()]
 
     def setupProblem(self, searchAgents):
-        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
-        gameState = pacman.GameState()
-        gameState.initialize(lay, 0)
+        gameState = getLayoutStartState(self.layoutText)
         problemClass = getattr(searchAgents, self.searchProblemClassName)
         problem = problemClass(gameState)
         state = problem.getStartState()
@@ -633,9 +640,7 @@ class ClosestDotTest(testClasses.TestCase):
         self.layoutName = testDict['layoutName']
 
     def solution(self, searchAgents):
-        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
-        gameState = pacman.GameState()
-        gameState.initialize(lay, 0)
+        gameState = getLayoutStartState(self.layoutText)
         path = searchAgents.ClosestDotSearchAgent().findPathToClosestDot(gameState)
         return path
 
@@ -692,9 +697,7 @@ class CornerHeuristicSanity(testClasses.TestCase):
     def execute(self, grades, moduleDict, solutionDict):
         search = moduleDict['search']
         searchAgents = moduleDict['searchAgents']
-        game_state = pacman.GameState()
-        lay = layout.Layout([l.strip() for l in self.layout_text.split('\n')])
-        game_state.initialize(lay, 0)
+        game_state = getLayoutStartState(self.layout_text)
         problem = searchAgents.CornersProblem(game_state)
         start_state = problem.getStartState()
         h0 = searchAgents.cornersHeuristic(start_state, problem)
@@ -748,9 +751,7 @@ class CornerHeuristicSanity(testClasses.TestCase):
         handle.write('# true cost of the optimal path from that state to a goal.\n')
 
         # solve problem and write solution
-        lay = layout.Layout([l.strip() for l in self.layout_text.split('\n')])
-        start_state = pacman.GameState()
-        start_state.initialize(lay, 0)
+        start_state = getLayoutStartState(self.layout_text)
         problem = searchAgents.CornersProblem(start_state)
         solution = search.astar(problem, searchAgents.cornersHeuristic)
         handle.write('cost: "%d"\n' % len(solution))
@@ -772,9 +773,7 @@ class CornerHeuristicPacman(testClasses.TestCase):
         total = 0
         true_cost = float(solutionDict['cost'])
         thresholds = map(int, solutionDict['thresholds'].split())
-        game_state = pacman.GameState()
-        lay = layout.Layout([l.strip() for l in self.layout_text.split('\n')])
-        game_state.initialize(lay, 0)
+        game_state = getLayoutStartState(self.layout_text)
         problem = searchAgents.CornersProblem(game_state)
         start_state = problem.getStartState()
         if searchAgents.cornersHeuristic(start_state, problem) > true_cost:
@@ -809,9 +808,7 @@ class CornerHeuristicPacman(testClasses.TestCase):
         handle.write('# used in scoring.\n')
 
         # solve problem and write solution
-        lay = layout.Layout([l.strip() for l in self.layout_text.split('\n')])
-        start_state = pacman.GameState()
-        start_state.initialize(lay, 0)
+        start_state = getLayoutStartState(self.layout_text)
         problem = searchAgents.CornersProblem(start_state)
         solution = search.astar(problem, searchAgents.cornersHeuristic)
         handle.write('cost: "%d"\n' % len(solution))
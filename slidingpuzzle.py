@@ -0,0 +1,423 @@
+# slidingpuzzle.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for 
+# educational purposes provided that (1) you do not distribute or publish 
+# solutions, (2) you retain this notice, and (3) you provide clear 
+# attribution to UC Berkeley, including a link to 
+# http://inst.eecs.berkeley.edu/~cs188/pacman/pacman.html
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero 
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and 
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+
+"""
+Sliding puzzles of any shape, the Eight Puzzle's bigger relatives, with
+additive pattern database heuristics.
+
+States pack into one integer the way eightpuzzle.packPuzzle does, with as
+many bits per tile as the puzzle needs.  The goal has the blank in the top
+left corner and tile t in cell t, cells numbered row by row.
+
+A pattern database holds, for each placement of a group of tiles, the fewest
+moves of those tiles that bring them home.  It is built once by a breadth
+first search back from the goal, where sliding a tile outside the group is
+free, and written to disk; after that it is memory-mapped from disk the first
+time a heuristic needs it.  Because only moves of its own tiles are counted,
+databases for disjoint groups can be added together and stay admissible.
+
+To solve random fifteen puzzles (building the databases the first time):
+
+> python slidingpuzzle.py --size 4x4 --count 3
+
+or to write a million random solvable ones to a file, to solve later with
+--puzzles or use elsewhere:
+
+> python slidingpuzzle.py --size 4x4 --generate 1000000 --output puzzles.bin
+"""
+import array
+import itertools
+import mmap
+import os
+import random
+import sys
+import time
+
+import search
+
+DEFAULT_DIRECTORY = 'patterndbs'
+MOVES = ['up', 'down', 'left', 'right']
+REVERSE = {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}
+
+class SlidingPuzzle:
+    """
+    The mechanics of a rows by cols sliding puzzle, over packed states.
+
+    >>> puzzle = SlidingPuzzle(4, 4)
+    >>> state = puzzle.result(puzzle.result(puzzle.goal, 'down'), 'right')
+    >>> puzzle.unpack(state)
+    [4, 1, 2, 3, 5, 0, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]
+    >>> [move for successor, move in puzzle.successors(state)]
+    ['up', 'down', 'left', 'right']
+    """
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.tileBits = max(4, (self.size - 1).bit_length())
+        self.tileMask = (1 << self.tileBits) - 1
+        self.blankShift = self.size * self.tileBits
+        self.neighbours = []
+        self.moveTable = []
+        for blank in range(self.size):
+            row, col = divmod(blank, cols)
+            targets = []
+            if row != 0: targets.append(('up', blank - cols))
+            if row != rows - 1: targets.append(('down', blank + cols))
+            if col != 0: targets.append(('left', blank - 1))
+            if col != cols - 1: targets.append(('right', blank + 1))
+            self.neighbours.append([cell for move, cell in targets])
+            # See eightpuzzle.buildMoveTable
+            self.moveTable.append([(move, self.tileBits * cell,
+                                    (1 << (self.tileBits * blank)) - (1 << (self.tileBits * cell)),
+                                    (cell - blank) << self.blankShift) for move, cell in targets])
+        self.goal = self.pack(range(self.size))
+
+    def pack(self, numbers):
+        "Packs a list of the tile in each cell, 0 for the blank, into a state"
+        state = numbers.index(0) << self.blankShift
+        for cell, tile in enumerate(numbers):
+            state |= tile << (self.tileBits * cell)
+        return state
+
+    def unpack(self, state):
+        return [int((state >> (self.tileBits * cell)) & self.tileMask) for cell in range(self.size)]
+
+    def successors(self, state):
+        "Returns (successor, move) pairs, moves naming the way the blank goes"
+        return [(state + ((state >> shift) & self.tileMask) * factor + blankChange, move)
+                for move, shift, factor, blankChange in self.moveTable[state >> self.blankShift]]
+
+    def result(self, state, move):
+        for successor, legalMove in self.successors(state):
+            if legalMove == move: return successor
+        raise Exception('Illegal move: ' + move)
+
+    def randomWalk(self, state, moves):
+        "Makes the given number of random moves from state, never undoing the last one"
+        lastMove = None
+        for i in range(moves):
+            successors = [(s, m) for s, m in self.successors(state) if REVERSE[m] != lastMove]
+            state, lastMove = random.choice(successors)
+        return state
+
+    def isSolvable(self, numbers):
+        """
+          Whether a list of the tile in each cell can be brought to the goal.
+        Every move swaps the blank with a neighbour, flipping both the parity
+        of the permutation and the parity of the blank's distance from its
+        goal cell, so a puzzle is solvable exactly when the two agree.
+
+        >>> puzzle = SlidingPuzzle(3, 3)
+        >>> puzzle.isSolvable([1, 0, 2, 3, 4, 5, 6, 7, 8]), puzzle.isSolvable([0, 2, 1, 3, 4, 5, 6, 7, 8])
+        (True, False)
+        """
+        seen = [False] * self.size
+        cycles = 0
+        for start in range(self.size):
+            if seen[start]: continue
+            cycles += 1
+            cell = start
+            while not seen[cell]:
+                seen[cell] = True
+                cell = numbers[cell]
+        row, col = divmod(numbers.index(0), self.cols)
+        return (self.size - cycles) % 2 == (row + col) % 2
+
+    def randomNumbers(self):
+        """
+          A list of the tile in each cell, drawn uniformly from the solvable
+        puzzles.  A shuffle that comes out unsolvable has two tiles swapped,
+        which pairs each unsolvable arrangement with exactly one solvable one.
+        """
+        numbers = range(self.size)
+        random.shuffle(numbers)
+        if not self.isSolvable(numbers):
+            first, second = [cell for cell in range(3) if numbers[cell] != 0][:2]
+            numbers[first], numbers[second] = numbers[second], numbers[first]
+        return numbers
+
+    def toString(self, state):
+        width = len(str(self.size - 1))
+        numbers = self.unpack(state)
+        lines = []
+        for row in range(self.rows):
+            cells = numbers[row * self.cols:(row + 1) * self.cols]
+            lines.append(' '.join([str(n).rjust(width) if n != 0 else ' ' * width for n in cells]))
+        return '\n'.join(lines)
+
+class SlidingPuzzleSearchProblem(search.SearchProblem):
+    """
+      A sliding puzzle as a search problem, with the same actions as
+    eightpuzzle.EightPuzzleSearchProblem.
+    """
+    def __init__(self, puzzle, start):
+        "start: a packed state or a list of the tile in each cell"
+        self.puzzle = puzzle
+        if isinstance(start, (int, long)): self.start = start
+        else: self.start = puzzle.pack(start)
+
+    def getStartState(self):
+        return self.start
+
+    def isGoalState(self, state):
+        return state == self.puzzle.goal
+
+    def getSuccessors(self, state):
+        return [(successor, move, 1) for successor, move in self.puzzle.successors(state)]
+
+    def getCostOfActions(self, actions):
+        return len(actions)
+
+class PatternDatabase:
+    """
+      The fewest moves of a group of tiles that bring them home, indexed by
+    their cells: the cell of the i-th tile of the group sits in bits
+    i * tileBits and up of the index.  Unreachable indices hold 255.
+    """
+    def __init__(self, puzzle, tiles, directory=DEFAULT_DIRECTORY):
+        self.puzzle = puzzle
+        self.tiles = list(tiles)
+        self.shifts = [puzzle.tileBits * slot for slot in range(len(self.tiles))]
+        self.length = 1 << (puzzle.tileBits * len(self.tiles))
+        name = 'pdb-%dx%d-%s.bin' % (puzzle.rows, puzzle.cols, '-'.join([str(t) for t in self.tiles]))
+        self.path = os.path.join(directory, name)
+        self.table = None
+
+    def getTable(self):
+        "Maps the database from disk, building it first if the file is missing or the wrong size"
+        if self.table == None:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) != self.length:
+                self.save(self.build())
+            handle = open(self.path, 'rb')
+            try:
+                self.table = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                handle.close()
+        return self.table
+
+    def build(self):
+        """
+          Breadth first search back from the goal over placements of the
+        group together with the region of cells the blank can reach without
+        moving them.  Each region is flooded at once, since moves inside it
+        are free, and every group tile bordering it gives a successor.
+        """
+        bits, mask, neighbours = self.puzzle.tileBits, self.puzzle.tileMask, self.puzzle.neighbours
+        table = bytearray('\xff') * self.length
+        # The cells the blank has been seen in, as a bit mask per placement
+        if self.puzzle.size <= 16: visited = array.array('H', [0]) * self.length
+        elif self.puzzle.size <= 32: visited = array.array('I', [0]) * self.length
+        else: visited = array.array('L', [0]) * self.length
+        cellBits = [1 << cell for cell in range(self.puzzle.size)]
+        # Entries are placement << bits | cell of the blank
+        goal = sum([tile << shift for tile, shift in zip(self.tiles, self.shifts)])
+        layer = [goal << bits]
+        depth = 0
+        while layer:
+            nextLayer = []
+            for entry in layer:
+                placement, blank = entry >> bits, entry & mask
+                seen = visited[placement]
+                if seen & cellBits[blank]: continue
+                if table[placement] > depth: table[placement] = depth
+                occupied = dict([((placement >> shift) & mask, shift) for shift in self.shifts])
+                seen |= cellBits[blank]
+                region = [blank]
+                while region:
+                    cell = region.pop()
+                    for neighbour in neighbours[cell]:
+                        shift = occupied.get(neighbour)
+                        if shift != None:
+                            # The tile slides into the blank, leaving it where the tile was
+                            moved = placement + ((cell - neighbour) << shift)
+                            if not visited[moved] & cellBits[neighbour]:
+                                nextLayer.append((moved << bits) | neighbour)
+                        elif not seen & cellBits[neighbour]:
+                            seen |= cellBits[neighbour]
+                            region.append(neighbour)
+                visited[placement] = seen
+            layer = nextLayer
+            depth += 1
+        return table
+
+    def save(self, table):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory): os.makedirs(directory)
+        tempPath = self.path + '.tmp'
+        handle = open(tempPath, 'wb')
+        try:
+            handle.write(table)
+        finally:
+            handle.close()
+        os.rename(tempPath, self.path)
+
+# Partitions that give stronger heuristics than splitting the tiles in order
+PARTITIONS = {(4, 4): [[1, 4, 5, 8, 9, 12], [2, 3, 6, 7, 10, 11], [13, 14, 15]]}
+
+def defaultPartition(puzzle):
+    "Splits the tiles, in order unless PARTITIONS has better, into groups small enough to build quickly"
+    if (puzzle.rows, puzzle.cols) in PARTITIONS: return PARTITIONS[(puzzle.rows, puzzle.cols)]
+    groupSize = max(1, 24 / puzzle.tileBits)
+    tiles = range(1, puzzle.size)
+    return [tiles[i:i + groupSize] for i in range(0, len(tiles), groupSize)]
+
+class PatternDatabaseHeuristic:
+    """
+      The sum of the pattern databases for a partition of the tiles into
+    disjoint groups.  A move changes the placement of one group only, so
+    successorValue looks up that group's database alone.
+    """
+    def __init__(self, puzzle, partition=None, directory=DEFAULT_DIRECTORY):
+        if partition == None: partition = defaultPartition(puzzle)
+        self.puzzle = puzzle
+        self.databases = [PatternDatabase(puzzle, tiles, directory) for tiles in partition]
+        # The database each tile belongs to and the tile's shift in its index
+        self.owners = {}
+        for database in self.databases:
+            for tile, shift in zip(database.tiles, database.shifts):
+                self.owners[tile] = (database, shift)
+        self.lastState, self.lastCells = None, None
+
+    def getCells(self, state):
+        """
+          Returns the cell of every tile in a state.  Successors come one
+        parent at a time, so the last answer is kept for the next call.
+        """
+        if state == self.lastState: return self.lastCells
+        puzzle = self.puzzle
+        cells = [0] * puzzle.size
+        for cell in range(puzzle.size):
+            cells[(state >> (puzzle.tileBits * cell)) & puzzle.tileMask] = cell
+        self.lastState, self.lastCells = state, cells
+        return cells
+
+    def __call__(self, state, problem=None):
+        cells = self.getCells(state)
+        total = 0
+        for database in self.databases:
+            index = 0
+            for tile, shift in zip(database.tiles, database.shifts):
+                index |= cells[tile] << shift
+            total += ord(database.getTable()[index])
+        return total
+
+    def successorValue(self, state, value, successor, action, problem=None):
+        puzzle = self.puzzle
+        blank, cell = state >> puzzle.blankShift, successor >> puzzle.blankShift
+        tile = (state >> (puzzle.tileBits * cell)) & puzzle.tileMask
+        if tile not in self.owners: return value
+        database, movedShift = self.owners[tile]
+        cells = self.getCells(state)
+        index = 0
+        for groupTile, shift in zip(database.tiles, database.shifts):
+            index |= cells[groupTile] << shift
+        table = database.getTable()
+        return value - ord(table[index]) + ord(table[index + ((blank - cell) << movedShift)])
+
+# Puzzle files hold one byte per cell, puzzle after puzzle, so large corpora
+# can be written and read back in bulk with array.
+
+def writePuzzleFile(path, puzzle, count, chunkSize=10000):
+    "Writes count uniformly random solvable puzzles to path"
+    handle = open(path, 'wb')
+    try:
+        while count > 0:
+            chunk = array.array('B')
+            for i in range(min(count, chunkSize)):
+                chunk.extend(puzzle.randomNumbers())
+            chunk.tofile(handle)
+            count -= min(count, chunkSize)
+    finally:
+        handle.close()
+
+def readPuzzleFile(path, puzzle, chunkSize=10000):
+    "Yields the puzzles in a file written by writePuzzleFile as lists of numbers"
+    handle = open(path, 'rb')
+    try:
+        while True:
+            chunk = array.array('B', handle.read(chunkSize * puzzle.size))
+            for start in range(0, len(chunk) - puzzle.size + 1, puzzle.size):
+                yield chunk[start:start + puzzle.size].tolist()
+            if len(chunk) < chunkSize * puzzle.size: break
+    finally:
+        handle.close()
+
+def parsePartition(text):
+    "Parses groups of tiles like 1,2,3/4,5,6"
+    return [[int(tile) for tile in group.split(',')] for group in text.split('/')]
+
+def readCommand(argv):
+    from optparse import OptionParser
+    parser = OptionParser('USAGE: python slidingpuzzle.py <options>')
+    parser.add_option('--size', dest='size', default='4x4',
+                      help='Rows and columns of the puzzle [Default: %default]')
+    parser.add_option('-n', '--count', dest='count', type='int', default=1,
+                      help='Number of random puzzles to solve [Default: %default]')
+    parser.add_option('--moves', dest='moves', type='int', default=None,
+                      help='Scramble each puzzle with this many random moves [Default: draw uniformly from solvable puzzles]')
+    parser.add_option('--puzzles', dest='puzzles', default=None,
+                      help='Solve the puzzles in this file instead of random ones')
+    parser.add_option('--generate', dest='generate', type='int', default=None,
+                      help='Just write this many uniformly random solvable puzzles, one per line or to --output')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='File for --generate to write puzzles to, one byte per cell')
+    parser.add_option('-a', '--algorithm', dest='algorithm', default='idastar',
+                      help='Search function from search.py [Default: %default]')
+    parser.add_option('--partition', dest='partition', default=None,
+                      help='Tile groups for the pattern databases, like 1,2,3/4,5,6 [Default: see defaultPartition]')
+    parser.add_option('--databases', dest='databases', default=DEFAULT_DIRECTORY,
+                      help='Directory the pattern databases are kept in [Default: %default]')
+    parser.add_option('--seed', dest='seed', type='int', default=None,
+                      help='Random seed for the puzzles')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    if options.seed != None: random.seed(options.seed)
+    rows, cols = [int(n) for n in options.size.split('x')]
+    puzzle = SlidingPuzzle(rows, cols)
+    if options.generate != None:
+        if options.output != None:
+            writePuzzleFile(options.output, puzzle, options.generate)
+        else:
+            for i in range(options.generate):
+                print ' '.join([str(n) for n in puzzle.randomNumbers()])
+        sys.exit(0)
+    if options.puzzles != None:
+        numbers = itertools.islice(readPuzzleFile(options.puzzles, puzzle), options.count)
+        states = [puzzle.pack(n) for n in numbers]
+    elif options.moves != None:
+        states = [puzzle.randomWalk(puzzle.goal, options.moves) for i in range(options.count)]
+    else:
+        states = [puzzle.pack(puzzle.randomNumbers()) for i in range(options.count)]
+    partition = None
+    if options.partition != None: partition = parsePartition(options.partition)
+    heuristic = PatternDatabaseHeuristic(puzzle, partition, options.databases)
+    start = time.time()
+    for database in heuristic.databases: database.getTable()
+    print 'Loaded %d pattern databases in %.2f seconds' % (len(heuristic.databases), time.time() - start)
+    searchFunction = getattr(search, options.algorithm)
+    for i, state in enumerate(states):
+        print 'Puzzle %d:' % (i + 1)
+        print puzzle.toString(state)
+        start = time.time()
+        actions, stats = searchFunction(SlidingPuzzleSearchProblem(puzzle, state), heuristic, returnStats=True)
+        print 'Solved in %d moves with %d expansions in %.2f seconds (starting estimate %d)' % (
+            len(actions), stats.expanded, time.time() - start, heuristic(state))
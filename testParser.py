@@ -13,9 +13,41 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import cPickle
+import os
 import re
 import sys
 
+# Parsed files: path -> ((modification time, size), parsed dict).  A file is
+# parsed again only when its modification time or size changes.  The cache
+# can be kept between runs with loadCache and saveCache.
+PARSED = {}
+
+def fileStamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+def preload(root):
+    "Parses every CONFIG, .test and .solution file under root into PARSED"
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            if name == 'CONFIG' or name.endswith('.test') or name.endswith('.solution'):
+                TestParser(os.path.join(dirpath, name)).parse()
+
+def loadCache(cachePath):
+    "Adds the entries of a cache written by saveCache to PARSED, if it can be read"
+    try:
+        with open(cachePath, 'rb') as handle:
+            PARSED.update(cPickle.load(handle))
+    except (IOError, EOFError, cPickle.UnpicklingError, ValueError, TypeError):
+        pass
+
+def saveCache(cachePath):
+    tempPath = cachePath + '.tmp'
+    with open(tempPath, 'wb') as handle:
+        cPickle.dump(PARSED, handle, cPickle.HIGHEST_PROTOCOL)
+    os.rename(tempPath, cachePath)
+
 class TestParser(object):
 
     def __init__(self, path):
@@ -34,6 +66,13 @@ class TestParser(object):
         return '\n'.join(fixed_lines)
 
     def parse(self):
+        stamp = fileStamp(self.path)
+        if self.path not in PARSED or PARSED[self.path][0] != stamp:
+            PARSED[self.path] = (stamp, self.parseFile())
+        # callers add keys to the dict they get back, so hand out a copy
+        return dict(PARSED[self.path][1])
+
+    def parseFile(self):
         # read in the test case and remove comments
         test = {}
         with open(self.path) as handle:
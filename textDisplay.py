@@ -13,10 +13,10 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
-import pacman, time
+import pacman, sys, time
 
 DRAW_EVERY = 1
-SLEEP_TIME = 0 # This can be overwritten by __init__
+REFRESH_TIME = 0 # Least time between frames, set by __init__; the game does not wait for them
 DISPLAY_MOVES = False
 QUIET = False # Supresses output
 
@@ -31,7 +31,7 @@ class NullGraphics:
         return True
 
     def pause(self):
-        time.sleep(SLEEP_TIME)
+        pass
 
     def draw(self, state):
         print state
@@ -43,36 +43,70 @@ class NullGraphics:
         pass
 
 class PacmanGraphics:
-    def __init__(self, speed=None):
+    """
+    Prints the board as GameStateData.__str__ does, without rebuilding it
+    cell by cell: the walls, food and capsules are kept as one bytearray per
+    row, patched as food is eaten, with the agents written over them only
+    while a frame is printed.  Frames are printed at most once every
+    REFRESH_TIME seconds (and for the first and last states), so skipped
+    turns cost next to nothing.
+    """
+    def __init__(self, speed=None, stream=None):
         if speed != None:
-            global SLEEP_TIME
-            SLEEP_TIME = speed
+            global REFRESH_TIME
+            REFRESH_TIME = speed
+        self.stream = stream
 
     def initialize(self, state, isBlue = False):
-        self.draw(state)
-        self.pause()
+        if self.stream == None: self.out = sys.stdout
+        else: self.out = self.stream
+        self.height = state.layout.height
+        walls = state.layout.walls
+        self.rows = [bytearray(state._foodWallStr(state.food[x][y], walls[x][y]) for x in range(state.layout.width))
+                     for y in range(self.height - 1, -1, -1)]
+        for capsule in state.capsules:
+            self.setCell(capsule, 'o')
         self.turn = 0
         self.agentCounter = 0
+        self.draw(state)
+
+    def setCell(self, position, char):
+        x, y = position
+        row = self.rows[self.height - 1 - y]
+        old = chr(row[x])
+        row[x] = char
+        return old
 
     def update(self, state):
+        if state._foodEaten != None: self.setCell(state._foodEaten, ' ')
+        if state._capsuleEaten != None: self.setCell(state._capsuleEaten, ' ')
         numAgents = len(state.agentStates)
         self.agentCounter = (self.agentCounter + 1) % numAgents
-        if self.agentCounter == 0:
+        if state._win or state._lose:
+            self.draw(state)
+        elif self.agentCounter == 0:
             self.turn += 1
             if DISPLAY_MOVES:
                 ghosts = [pacman.nearestPoint(state.getGhostPosition(i)) for i in range(1, numAgents)]
-                print "%4d) P: %-8s" % (self.turn, str(pacman.nearestPoint(state.getPacmanPosition()))),'| Score: %-5d' % state.score,'| Ghosts:', ghosts
-            if self.turn % DRAW_EVERY == 0:
+                print >>self.out, "%4d) P: %-8s" % (self.turn, str(pacman.nearestPoint(state.getPacmanPosition()))),'| Score: %-5d' % state.score,'| Ghosts:', ghosts
+            if self.turn % DRAW_EVERY == 0 and time.time() - self.lastDraw >= REFRESH_TIME:
                 self.draw(state)
-                self.pause()
-        if state._win or state._lose:
-            self.draw(state)
-
-    def pause(self):
-        time.sleep(SLEEP_TIME)
 
     def draw(self, state):
-        print state
+        # Agents go over food but under capsules, as in GameStateData.__str__
+        covered = []
+        for agentState in state.agentStates:
+            if agentState == None or agentState.configuration == None: continue
+            position = [int(i) for i in pacman.nearestPoint(agentState.configuration.pos)]
+            if agentState.isPacman: char = state._pacStr(agentState.configuration.direction)
+            else: char = state._ghostStr(agentState.configuration.direction)
+            if self.rows[self.height - 1 - position[1]][position[0]] != ord('o'):
+                covered.append((position, self.setCell(position, char)))
+        self.out.write('%s\nScore: %d\n\n' % ('\n'.join(map(str, self.rows)), state.score))
+        self.out.flush()
+        for position, old in reversed(covered):
+            self.setCell(position, old)
+        self.lastDraw = time.time()
 
     def finish(self):
         pass
@@ -588,6 +588,7 @@ def pause():
 # this have all student code so wrapped.
 #
 import signal
+import threading
 import time
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
@@ -623,6 +624,84 @@ class TimeoutFunction:
         return result
 
 
+class MoveTimer:
+    """
+    Times many calls in a row, such as every move of a game.  Unlike
+    TimeoutFunction, the SIGALRM handler is installed once by start() and each
+    call only arms an interval timer, so budgets may be fractions of a second.
+    Where interval timers are unavailable (or off the main thread), the time
+    taken is checked after the call returns instead.
+
+    An alarm already pending when start() is called (e.g. from a
+    TimeoutFunction around the whole game) keeps its deadline: the timer is
+    always armed for whichever deadline comes first, and when it is the outer
+    one, its own handler is run.
+    """
+    def __init__(self):
+        self.active = False
+        self.oldHandler = None
+        self.outerDeadline = None
+        self.callDeadline = None
+
+    def handle_timeout(self, signum, frame):
+        if self.callDeadline != None and (self.outerDeadline == None or self.callDeadline <= self.outerDeadline):
+            raise TimeoutFunctionException()
+        # The outer alarm is due, and goes off only once
+        self.outerDeadline = None
+        if callable(self.oldHandler):
+            self.oldHandler(signum, frame)
+        else:
+            # The default action or none: leave it to the signal module
+            self.stop()
+            signal.setitimer(signal.ITIMER_REAL, 0.001)
+
+    def start(self):
+        if self.active: return
+        if not hasattr(signal, 'setitimer') or threading.current_thread().name != 'MainThread': return
+        remaining = signal.getitimer(signal.ITIMER_REAL)[0]
+        if remaining > 0: self.outerDeadline = time.time() + remaining
+        self.callDeadline = None
+        self.oldHandler = signal.signal(signal.SIGALRM, self.handle_timeout)
+        self.active = True
+
+    def stop(self):
+        if not self.active: return
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if self.oldHandler != None: signal.signal(signal.SIGALRM, self.oldHandler)
+        self.active = False
+        self.callDeadline = None
+        if self.outerDeadline != None:
+            # Not yet due; hand it back
+            signal.setitimer(signal.ITIMER_REAL, max(self.outerDeadline - time.time(), 0.001))
+            self.outerDeadline = None
+
+    def arm(self):
+        "Sets the interval timer for the first deadline, or clears it if there is none"
+        deadlines = [d for d in (self.callDeadline, self.outerDeadline) if d != None]
+        if deadlines:
+            signal.setitimer(signal.ITIMER_REAL, max(min(deadlines) - time.time(), 0.001))
+        else:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    def __call__(self, function, budget, *args, **keyArgs):
+        "Calls function, raising TimeoutFunctionException after budget seconds"
+        if budget <= 0:
+            raise TimeoutFunctionException()
+        if not self.active:
+            startTime = time.time()
+            result = function(*args, **keyArgs)
+            if time.time() - startTime >= budget:
+                raise TimeoutFunctionException()
+            return result
+        self.callDeadline = time.time() + budget
+        self.arm()
+        try:
+            return function(*args, **keyArgs)
+        finally:
+            self.callDeadline = None
+            if self.active: self.arm()
+
+
 
 _ORIGINAL_STDOUT = None
 _ORIGINAL_STDERR = None